@@ -3,16 +3,31 @@
 Pre-commit hook to test cookiecutter template generation.
 
 This script tests that the cookiecutter template can be generated successfully
-without Jinja2 syntax errors or other issues.
+without Jinja2 syntax errors or other issues, and checks the behavior of the
+generated monorepo scripts that CI can't observe from the generated files alone.
 """
 
+import importlib.util
+import io
 import json
 import shutil
-import subprocess
 import sys
 import tempfile
 from pathlib import Path
 
+# The template's own scripts (plain Python, not rendered by cookiecutter)
+SCRIPTS_DIR = Path(__file__).parent.parent / "{{cookiecutter.project_slug}}" / "scripts"
+
+# The streaming subprocess runner is shared with the template's own scripts, which are also tested here
+sys.path.insert(0, str(SCRIPTS_DIR))
+from graph import Member, WorkspaceGraph  # noqa: E402
+from monorepo import affected_members  # noqa: E402
+from process_runner import run_command  # noqa: E402
+
+# Per-command timeouts, so a hung cookiecutter or ruff fails the hook instead of blocking the commit
+COOKIECUTTER_TIMEOUT_SECONDS = 300
+RUFF_TIMEOUT_SECONDS = 120
+
 
 def test_template_generation():
     """Test that the cookiecutter template generates successfully."""
@@ -40,20 +55,12 @@ def test_template_generation():
 
         # Run cookiecutter
         print(f"  Running: {' '.join(cmd[:4])} ...")
-        try:
-            result = subprocess.run(
-                cmd,
-                check=True,
-                capture_output=True,
-                text=True,
-                cwd=tmp_path,
-            )
-            print("  ✓ Template generated successfully")
-        except subprocess.CalledProcessError as e:
-            print(f"\n✗ Template generation failed!")
-            print(f"\nStdout:\n{e.stdout}")
-            print(f"\nStderr:\n{e.stderr}")
+        result = run_command(cmd, cwd=tmp_path, timeout=COOKIECUTTER_TIMEOUT_SECONDS)
+        if not result.ok:
+            print(f"\n✗ Template generation failed: {result.describe_failure(COOKIECUTTER_TIMEOUT_SECONDS)}")
+            print(f"\nOutput (last {len(result.tail)} lines):\n{result.output}")
             return False
+        print("  ✓ Template generated successfully")
 
         # Find the generated project directory
         generated_dirs = list(tmp_path.iterdir())
@@ -66,32 +73,123 @@ def test_template_generation():
 
         # Run ruff check on generated code
         print("  Running ruff check on generated code...")
-        try:
-            subprocess.run(
-                ["ruff", "check", str(project_dir)],
-                check=True,
-                capture_output=True,
-                text=True,
-            )
-            print("  ✓ Ruff check passed")
-        except subprocess.CalledProcessError as e:
-            print(f"\n✗ Ruff check failed!")
-            print(f"\nStdout:\n{e.stdout}")
-            print(f"\nStderr:\n{e.stderr}")
+        result = run_command(["ruff", "check", str(project_dir)], timeout=RUFF_TIMEOUT_SECONDS)
+        if result.returncode is None and not result.timed_out:
+            print("  ⚠ Ruff not found, skipping lint check")
+            print("    Install ruff with: pip install ruff")
+        elif not result.ok:
+            print(f"\n✗ Ruff check failed: {result.describe_failure(RUFF_TIMEOUT_SECONDS)}")
+            print(f"\nOutput (last {len(result.tail)} lines):\n{result.output}")
             print("\nHint: You can auto-fix most issues by running:")
             print(f"  cookiecutter . --no-input && cd test-monorepo && ruff check --fix .")
             return False
-        except FileNotFoundError:
-            print("  ⚠ Ruff not found, skipping lint check")
-            print("    Install ruff with: pip install ruff")
+        else:
+            print("  ✓ Ruff check passed")
 
         print("\n✓ All template generation tests passed!")
         return True
 
 
+def load_add_project():
+    """Import scripts/add-project.py (not importable by name because of the dash)"""
+    spec = importlib.util.spec_from_file_location("add_project", SCRIPTS_DIR / "add-project.py")
+    module = importlib.util.module_from_spec(spec)
+    # dataclasses look the module up while the classes are created
+    sys.modules["add_project"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_gitattributes_sections():
+    """Test that projects with the same name in different target dirs keep their own attributes."""
+    print("Testing .gitattributes sections of same-named projects...")
+    add_project = load_add_project()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monorepo_root = Path(tmpdir)
+        # Section of apps/foo-cli written before sections were keyed by path
+        (monorepo_root / ".gitattributes").write_text("# Attributes from foo-cli\napps/foo-cli/*.py text eol=lf\n")
+        files = add_project.MonorepoFiles(monorepo_root)
+
+        projects = {
+            "apps/foo-cli": ["apps/foo-cli/*.py text eol=lf", "apps/foo-cli/*.png binary"],
+            "services/foo-cli": ["services/foo-cli/*.ts text eol=lf"],
+        }
+        for project, lines in projects.items():
+            project_path = monorepo_root / project
+            project_path.mkdir(parents=True)
+            prepared = add_project.PreparedProject(project_path, "python", gitattributes=list(lines))
+            plan = add_project.IntegrationPlan()
+            context = add_project.IntegrationContext(
+                project_path, monorepo_root, prepared, plan, files=files, output=io.StringIO()
+            )
+            add_project.merge_gitattributes(context)
+        files.flush()
+
+        content = (monorepo_root / ".gitattributes").read_text()
+        expected = [line for lines in projects.values() for line in lines]
+        missing = [line for line in expected if line not in content.split("\n")]
+        if missing or "# Attributes from foo-cli\n" in content:
+            print(f"\n✗ Unexpected .gitattributes (missing: {missing}):\n{content}")
+            return False
+
+        # Moving one project's attributes into its own directory leaves the other's section alone
+        project_path = monorepo_root / "services/foo-cli"
+        prepared = add_project.PreparedProject(project_path, "python", gitattributes=projects["services/foo-cli"])
+        plan = add_project.IntegrationPlan(gitattributes="per-directory")
+        context = add_project.IntegrationContext(
+            project_path, monorepo_root, prepared, plan, files=files, output=io.StringIO()
+        )
+        add_project.merge_gitattributes(context)
+        files.flush()
+
+        content = (monorepo_root / ".gitattributes").read_text()
+        if "apps/foo-cli/*.png binary" not in content or "services/foo-cli/" in content:
+            print(f"\n✗ Unexpected .gitattributes after moving services/foo-cli per-directory:\n{content}")
+            return False
+
+    print("  ✓ Each project kept its own section")
+    return True
+
+
+def test_affected_members():
+    """Test which changed files affect which workspace members (scripts/monorepo.py affected)."""
+    print("Testing affected members...")
+    graph = WorkspaceGraph(
+        {
+            "packages/core": Member("packages/core", "python"),
+            "apps/api": Member("apps/api", "python", dependencies=["packages/core"]),
+            "apps/web": Member("apps/web", "typescript"),
+        }
+    )
+    everything = set(graph.members)
+    cases = {
+        ("packages/core/src/core.py",): {"packages/core", "apps/api"},
+        ("apps/web/src/index.ts",): {"apps/web"},
+        ("README.md",): set(),
+        ("uv.lock",): everything,
+        # CI setup and the scripts deciding what is affected
+        (".github/workflows/ci.yml",): everything,
+        (".github/actions/setup/action.yml",): everything,
+        ("scripts/graph.py",): everything,
+        ("scripts/monorepo.py",): everything,
+        ("scripts/add-project.py",): set(),
+    }
+    for files, expected in cases.items():
+        affected = affected_members(graph, files)
+        if affected != expected:
+            print(f"\n✗ {', '.join(files)} affects {sorted(affected)}, expected {sorted(expected)}")
+            return False
+
+    print("  ✓ Affected members are as expected")
+    return True
+
+
 def main():
     """Main entry point."""
     success = test_template_generation()
+    success = test_gitattributes_sections() and success
+    success = test_affected_members() and success
     sys.exit(0 if success else 1)
 
 
@@ -4,18 +4,32 @@ Add Project Tool - Integrate external cookiecutter templates into this monorepo
 
 This script:
 1. Reads .monorepo/project-templates.yaml to find template configuration
-2. Runs cookiecutter with the external template
+2. Fetches the template into the local template cache and runs cookiecutter with it
 3. Places the generated project in the appropriate directory
 4. Integrates it with monorepo conventions (removes duplicate configs, adds to workspace)
 
 Usage:
-    ./scripts/add-project.py <template-type> <project-name>
+    ./scripts/add-project.py <template-type> <project-name> [--engine auto|in-process|subprocess]
+                             [--sync scoped|full] [--trace out.json]
 
     Example:
         ./scripts/add-project.py cli my-awesome-cli
         ./scripts/add-project.py api user-service
         ./scripts/add-project.py lib shared-utils
 
+    Add many projects from a manifest (generated in parallel, one workspace sync at the end):
+        ./scripts/add-project.py batch projects.yaml [--jobs N]
+
+    Pin template versions to commits (.monorepo/templates.lock):
+        ./scripts/add-project.py lock [--update] [template ...]
+
+    Profile a slow run (Chrome trace-event JSON, open in chrome://tracing or ui.perfetto.dev):
+        ./scripts/add-project.py cli my-awesome-cli --trace add-project-trace.json
+
+    Template cache (.monorepo/cache/templates/):
+        ./scripts/add-project.py prefetch [--jobs N] [template ...]
+        ./scripts/add-project.py cache prune [--max-size MB]
+
 Configuration:
     Add your template URLs to .monorepo/project-templates.yaml
 
@@ -26,16 +40,86 @@ Integration:
     - Extend the script to support more complex workflows
 """
 
+import contextlib
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
 import subprocess
 import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterator, Optional, TextIO
 
 import yaml
+from package_metadata import normalize_package_name, python_requirements
+from process_runner import CommandResult, run_command
 
+# Template cache defaults (override with the top-level "cache" section of project-templates.yaml)
+DEFAULT_CACHE_DIR = ".monorepo/cache/templates"
+DEFAULT_CACHE_MAX_SIZE_MB = 1024
 
-def load_template_config(monorepo_root: Path) -> dict[str, Any]:
-    """Load project template configuration from .monorepo/project-templates.yaml"""
+# Pinned template commits, relative to the monorepo root
+TEMPLATE_LOCK_FILE = ".monorepo/templates.lock"
+
+# How cookiecutter templates are rendered: "auto" (in-process when cookiecutter is importable),
+# "in-process" (cookiecutter Python API) or "subprocess" (cookiecutter command)
+COOKIECUTTER_ENGINES = ("auto", "in-process", "subprocess")
+
+# How workspaces are synced after adding projects: "scoped" installs only the new members' closure
+# (reusing the lockfiles when they already cover the new dependencies), "full" syncs the whole monorepo
+SYNC_MODES = ("scoped", "full")
+
+# Timeouts for git operations on template repositories and for workspace syncs (uv/npm)
+GIT_TIMEOUT_SECONDS = 600
+SYNC_TIMEOUT_SECONDS = 1800
+
+# A full 40-character commit SHA (used as-is, without resolving against the remote)
+COMMIT_SHA_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+
+# Template files at least this large are memory-mapped when substituting customizations
+CUSTOMIZE_MMAP_THRESHOLD = 1024 * 1024
+
+# Leading bytes checked for a NUL byte to detect binary files (the same heuristic git uses)
+BINARY_SNIFF_BYTES = 8000
+
+# Top-level project files up to this size are hashed by ProjectFacts.scan()
+FACTS_HASH_MAX_BYTES = 1024 * 1024
+
+# Per-project integration manifests (what integration wrote, see write_integration_manifest)
+INTEGRATION_MANIFEST_DIR = ".monorepo/integrations"
+
+# Registry of the projects added to the monorepo (see MonorepoFiles.register_project), so tooling
+# can look up members and their types without walking the tree
+PROJECT_REGISTRY = ".monorepo/projects.json"
+
+# Generated matrix workflow ("workflows: matrix" integration mode) and the job groups it is built from
+WORKFLOW_MATRIX_FILE = ".github/workflows/projects.yml"
+WORKFLOW_MATRIX_STATE = ".monorepo/workflow-matrix.json"
+
+# "changes" job step of the matrix workflow: writes each job group's affected projects (a JSON list,
+# see scripts/monorepo.py affected) to the step outputs
+AFFECTED_PROJECTS_STEP = """\
+affected=$(python scripts/monorepo.py affected --base "$BASE" --head "$GITHUB_SHA" --json)
+jq -r --argjson affected "$affected" <<< "$PROJECT_GROUPS" >> "$GITHUB_OUTPUT" \\
+  'to_entries[] | "\\(.key)=\\([.value[] | select(IN($affected[]))] | tojson)"'
+"""
+
+# {placeholder} tokens recorded in the placeholder index of cached github-template checkouts
+PLACEHOLDER_NAME_PATTERN = re.compile(r"[A-Za-z0-9_.-]+")
+PLACEHOLDER_TOKEN_PATTERN = re.compile(rb"\{([A-Za-z0-9_.-]+)\}")
+
+# files regex of a pre-commit hook limited to project directories: ^apps/x/ or ^(?:apps/x|apps/y)/
+HOOK_SCOPE_PATTERN = re.compile(r"\^(?:\(\?:([^()]+)\)|([^()|]+))/")
+
+
+def load_monorepo_config(monorepo_root: Path) -> dict[str, Any]:
+    """Load the full .monorepo/project-templates.yaml file"""
     config_path = monorepo_root / ".monorepo" / "project-templates.yaml"
 
     if not config_path.exists():
@@ -46,7 +130,15 @@ def load_template_config(monorepo_root: Path) -> dict[str, Any]:
     with open(config_path) as f:
         config = yaml.safe_load(f)
 
-    if not config or "templates" not in config:
+    return config or {}
+
+
+def load_template_config(monorepo_root: Path) -> dict[str, Any]:
+    """Load project template configuration from .monorepo/project-templates.yaml"""
+    config = load_monorepo_config(monorepo_root)
+
+    if "templates" not in config:
+        config_path = monorepo_root / ".monorepo" / "project-templates.yaml"
         print(f"Error: No templates defined in {config_path}")
         print("Add template configurations to the 'templates' section")
         sys.exit(1)
@@ -54,35 +146,637 @@ def load_template_config(monorepo_root: Path) -> dict[str, Any]:
     return config["templates"]
 
 
-def run_cookiecutter(template_config: dict[str, Any], project_name: str, target_dir: Path) -> Path:
-    """Run cookiecutter with the external template"""
+class Tracer:
+    """
+    Timed spans of add-project.py's phases, written as a Chrome trace (--trace out.json).
+
+    Open the file in chrome://tracing or https://ui.perfetto.dev. Each span records its wall time,
+    the bytes this process read and wrote during it (Linux only), and the CPU time of subprocesses
+    that finished during it. Spans are no-ops unless tracing is enabled.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.events: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = "step", **args: Any) -> Iterator[dict[str, Any]]:
+        """Record the enclosed block as one span; add details to the yielded args dict"""
+        if not self.enabled:
+            yield args
+            return
+
+        start_time = time.time()
+        start = time.perf_counter()
+        start_io = process_io_bytes()
+        start_children = children_cpu_seconds()
+        try:
+            yield args
+        finally:
+            duration = time.perf_counter() - start
+            end_io = process_io_bytes()
+            if start_io and end_io:
+                args["read_bytes"] = end_io[0] - start_io[0]
+                args["written_bytes"] = end_io[1] - start_io[1]
+            args["subprocess_cpu_s"] = round(children_cpu_seconds() - start_children, 6)
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": int(start_time * 1_000_000),
+                "dur": int(duration * 1_000_000),
+                "pid": os.getpid(),
+                "tid": threading.get_native_id(),
+                "args": args,
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def enable(self, trace_path: Path) -> None:
+        """Start recording spans; the trace is written to trace_path when the script exits (also on errors)"""
+        import atexit
+
+        self.enabled = True
+        atexit.register(self.write, trace_path)
+
+    def write(self, trace_path: Path) -> None:
+        """Write the recorded spans in Chrome trace-event format"""
+        trace = {"traceEvents": sorted(self.events, key=lambda e: e["ts"]), "displayTimeUnit": "ms"}
+        trace_path.write_text(json.dumps(trace, indent=1) + "\n")
+        print(f"\nTrace written to {trace_path} ({len(self.events)} spans)")
+
+
+# Spans of the current run (enabled with --trace)
+TRACER = Tracer()
+
+
+def process_io_bytes() -> Optional[tuple[int, int]]:
+    """Bytes read and written by this process so far (from /proc/self/io), or None if unavailable"""
+    try:
+        counters = dict(line.split(": ") for line in Path("/proc/self/io").read_text().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (
+        OSError,
+        KeyError,
+        ValueError,
+    ):
+        return None
+
+
+def children_cpu_seconds() -> float:
+    """User + system CPU time of finished subprocesses so far"""
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return 0.0
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class TemplateCache:
+    """
+    Persistent, content-addressed cache of template checkouts.
+
+    Each entry is a plain checkout (without .git) of one repository at one commit, stored as:
+    - <cache_dir>/<key>/       the template files
+    - <cache_dir>/<key>.json   metadata (repo, ref, sha, size); its mtime records the last use
+    - <cache_dir>/<key>.placeholders   placeholder index of github-template checkouts (built on first use)
+
+    Entries are keyed by repo URL plus commit SHA, so they never go stale. Partial entries, which
+    only hold the subtree a nested template integrates (see integrate_path), add a variant suffix to
+    the key. The cache is bounded by size: least recently used entries are evicted once the total
+    exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_config(cls, monorepo_root: Path) -> "TemplateCache":
+        """Create the cache from the optional "cache" section of project-templates.yaml"""
+        settings = load_monorepo_config(monorepo_root).get("cache") or {}
+        cache_dir = monorepo_root / settings.get("dir", DEFAULT_CACHE_DIR)
+        max_size_mb = settings.get("max_size_mb", DEFAULT_CACHE_MAX_SIZE_MB)
+        return cls(cache_dir, int(max_size_mb * 1024 * 1024))
+
+    @staticmethod
+    def entry_key(repo: str, sha: str, variant: Optional[str] = None) -> str:
+        """Cache key for a repository at a commit (optionally for a partial checkout variant)"""
+        repo_hash = hashlib.sha256(repo.encode()).hexdigest()[:16]
+        key = f"{repo_hash}-{sha}"
+        return f"{key}-{variant}" if variant else key
+
+    def lookup(self, repo: str, sha: str, variant: Optional[str] = None) -> Optional[Path]:
+        """Return the cached checkout for repo@sha (marking it as recently used), or None"""
+        key = self.entry_key(repo, sha, variant)
+        entry_dir = self.cache_dir / key
+        meta_path = self.cache_dir / f"{key}.json"
+        if not entry_dir.is_dir() or not meta_path.exists():
+            return None
+
+        os.utime(meta_path)
+        return entry_dir
+
+    def new_staging_dir(self) -> Path:
+        """Create an empty directory inside the cache, on the same filesystem as the entries"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        staging_dir = self.cache_dir / f".staging-{uuid.uuid4().hex}"
+        staging_dir.mkdir()
+        return staging_dir
+
+    def store(
+        self,
+        repo: str,
+        ref: str,
+        sha: str,
+        staging_dir: Path,
+        variant: Optional[str] = None,
+        subtree: Optional[str] = None,
+    ) -> Path:
+        """Publish a populated staging directory as the entry for repo@sha"""
+        key = self.entry_key(repo, sha, variant)
+        entry_dir = self.cache_dir / key
+
+        size = directory_size(staging_dir)
+        try:
+            os.rename(staging_dir, entry_dir)
+        except OSError:
+            # Another process published the same entry first - keep theirs
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        metadata = {"repo": repo, "ref": ref, "sha": sha, "size": size, "created_at": time.time()}
+        if subtree:
+            metadata["subtree"] = subtree
+        meta_path = self.cache_dir / f"{key}.json"
+        tmp_meta_path = meta_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp_meta_path.write_text(json.dumps(metadata, indent=2) + "\n")
+        os.replace(tmp_meta_path, meta_path)
+
+        self.evict(keep=key)
+        return entry_dir
+
+    def entries(self) -> list[dict[str, Any]]:
+        """List cache entries, least recently used first"""
+        if not self.cache_dir.exists():
+            return []
+
+        entries = []
+        for meta_path in self.cache_dir.glob("*.json"):
+            try:
+                metadata = json.loads(meta_path.read_text())
+                last_used = meta_path.stat().st_mtime
+            except (
+                OSError,
+                json.JSONDecodeError,
+            ):
+                # Removed by a concurrent prune, or unreadable
+                continue
+            metadata["key"] = meta_path.stem
+            metadata["last_used"] = last_used
+            entries.append(metadata)
+
+        entries.sort(key=lambda e: e["last_used"])
+        return entries
+
+    def latest_sha(self, repo: str, ref: str) -> Optional[str]:
+        """Most recently cached commit for repo@ref (used when the remote can't be reached)"""
+        matches = [e for e in self.entries() if e.get("repo") == repo and e.get("ref") == ref]
+        if not matches:
+            return None
+        return max(matches, key=lambda e: e.get("created_at", 0))["sha"]
+
+    def remove(self, key: str) -> None:
+        """Delete one entry (metadata first, so a half-deleted entry is never used)"""
+        (self.cache_dir / f"{key}.json").unlink(missing_ok=True)
+        (self.cache_dir / f"{key}.placeholders").unlink(missing_ok=True)
+        shutil.rmtree(self.cache_dir / key, ignore_errors=True)
+
+    def evict(self, max_bytes: Optional[int] = None, keep: Optional[str] = None) -> tuple[int, int]:
+        """
+        Evict least recently used entries until the cache fits in max_bytes.
+
+        Returns (entries removed, bytes freed).
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(e.get("size", 0) for e in entries)
+
+        removed = 0
+        freed = 0
+        for entry in entries:
+            if total <= limit:
+                break
+            if entry["key"] == keep:
+                continue
+            self.remove(entry["key"])
+            total -= entry.get("size", 0)
+            freed += entry.get("size", 0)
+            removed += 1
+
+        # Clean up staging directories left behind by interrupted fetches
+        for staging_dir in self.cache_dir.glob(".staging-*") if self.cache_dir.exists() else []:
+            if time.time() - staging_dir.stat().st_mtime > 3600:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+
+        return removed, freed
+
+
+def directory_size(path: Path) -> int:
+    """Total size in bytes of all files below path"""
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for file_name in files:
+            try:
+                total += os.lstat(os.path.join(root, file_name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def resolve_template_sha(repo: str, version: str, cache: TemplateCache) -> str:
+    """
+    Resolve a branch or tag name to a commit SHA with `git ls-remote`.
+
+    This only negotiates refs with the remote (no objects are transferred). If the remote is
+    unreachable, the most recently cached commit for the same ref is used instead.
+    """
+    if COMMIT_SHA_PATTERN.match(version):
+        return version
+
+    try:
+        lines: list[str] = []
+        run_command(["git", "ls-remote", repo, version], timeout=GIT_TIMEOUT_SECONDS, on_line=lines.append, check=True)
+        refs = {}
+        for line in lines:
+            if "\t" not in line:
+                # Warnings on stderr
+                continue
+            sha, ref_name = line.split("\t", 1)
+            refs[ref_name] = sha
+
+        # Prefer branches, then peeled (annotated) tags, then anything else that matched
+        for ref_name in (f"refs/heads/{version}", f"refs/tags/{version}" + "^{}", f"refs/tags/{version}"):
+            if ref_name in refs:
+                return refs[ref_name]
+        if refs:
+            return next(iter(refs.values()))
+
+        print(f"Error: '{version}' not found in {repo}")
+        sys.exit(1)
+    except subprocess.CalledProcessError as e:
+        cached_sha = cache.latest_sha(repo, version)
+        if cached_sha:
+            print(f"  Warning: Could not reach {repo}, using cached commit {cached_sha[:12]}")
+            return cached_sha
+
+        print(f"Error resolving {repo} @ {version}: {e}")
+        print(f"stderr: {e.stderr}")
+        sys.exit(1)
+
+
+def load_template_lock(monorepo_root: Path) -> dict[str, dict[str, str]]:
+    """Load pinned template commits from .monorepo/templates.lock (empty if there is no lockfile)"""
+    lock_path = monorepo_root / TEMPLATE_LOCK_FILE
+    if not lock_path.exists():
+        return {}
+
+    with open(lock_path) as f:
+        lock = yaml.safe_load(f) or {}
+
+    return lock.get("templates") or {}
+
+
+def write_template_lock(monorepo_root: Path, locked: dict[str, dict[str, str]]) -> None:
+    """Write pinned template commits to .monorepo/templates.lock"""
+    lock_path = monorepo_root / TEMPLATE_LOCK_FILE
+    header = (
+        "# Pinned template commits - generated by scripts/add-project.py, commit this file.\n"
+        "# Run `./scripts/add-project.py lock --update` to move templates to the latest commit of their version.\n"
+    )
+    content = yaml.dump({"templates": dict(sorted(locked.items()))}, default_flow_style=False, sort_keys=False)
+    lock_path.write_text(header + content)
+
+
+def locked_sha(locked: dict[str, dict[str, str]], template_key: str, template_config: dict[str, Any]) -> Optional[str]:
+    """Pinned commit for a template, if the lock entry still matches its repo and version"""
+    entry = locked.get(template_key)
+    if not entry:
+        return None
+    if entry.get("repo") != template_config["repo"] or entry.get("version") != template_config.get("version", "main"):
+        return None
+    return entry.get("sha")
+
+
+def resolve_locked_template(template_key: str, template_config: dict[str, Any], monorepo_root: Path) -> str:
+    """
+    Commit SHA to generate a template from.
+
+    Uses the SHA pinned in .monorepo/templates.lock when there is one (no remote access needed).
+    Otherwise resolves the version against the remote and pins the result in the lockfile.
+    """
+    locked = load_template_lock(monorepo_root)
+    sha = locked_sha(locked, template_key, template_config)
+    if sha:
+        return sha
+
     repo = template_config["repo"]
     version = template_config.get("version", "main")
+    sha = resolve_template_sha(repo, version, TemplateCache.from_config(monorepo_root))
 
-    print(f"Generating project from template: {repo} @ {version}")
-    print(f"Target directory: {target_dir}")
+    if template_key in locked:
+        print(f"  Template '{template_key}' changed in project-templates.yaml, re-pinning")
+    locked[template_key] = {"repo": repo, "version": version, "sha": sha}
+    write_template_lock(monorepo_root, locked)
+    print(f"  Pinned '{template_key}' to {sha[:12]} in {TEMPLATE_LOCK_FILE}")
+    return sha
 
-    # Build cookiecutter command
-    cmd = [
-        "cookiecutter",
-        repo,
-        f"--checkout={version}",
-        f"--output-dir={target_dir}",
-    ]
 
-    # Add defaults if provided
-    if "defaults" in template_config:
-        cmd.append("--no-input")
-        # Pass defaults as extra context
-        for key, value in template_config["defaults"].items():
-            cmd.append(f"{key}={value}")
+def fetch_template(
+    template_config: dict[str, Any], monorepo_root: Path, sha: Optional[str] = None, sparse: bool = False
+) -> Path:
+    """
+    Return a local checkout of the template, fetching it into the template cache if needed.
+
+    If sha is given (e.g. from the lockfile) it is used directly, without resolving the version
+    against the remote. With sparse=True, nested cookiecutter templates (see template_subtree_variant)
+    are checked out partially: only the subtree that integrate_path extracts, so sibling projects are
+    neither downloaded nor rendered. The checkout is shared by all projects generated from the same
+    commit and must not be modified.
+    """
+    repo = template_config["repo"]
+    version = template_config.get("version", "main")
 
+    cache = TemplateCache.from_config(monorepo_root)
+    if sha is None:
+        sha = resolve_template_sha(repo, version, cache)
+
+    variant = template_subtree_variant(template_config) if sparse else None
+    if variant:
+        cached_dir = cache.lookup(repo, sha, variant)
+        if cached_dir:
+            print(f"Using cached template: {repo} @ {version} ({sha[:12]}, integrated subtree only)")
+            return cached_dir
+
+    cached_dir = cache.lookup(repo, sha)
+    if cached_dir:
+        print(f"Using cached template: {repo} @ {version} ({sha[:12]})")
+        if variant:
+            # Render from a hard-linked copy of just the needed subtree
+            with TRACER.span("link template subtree", category="fetch", repo=repo, sha=sha):
+                return link_template_subtree(cached_dir, template_config, repo, version, sha, cache, variant)
+        return cached_dir
+
+    print(f"Fetching template: {repo} @ {version} ({sha[:12]})")
     try:
-        subprocess.run(cmd, check=True)
+        with TRACER.span("clone", category="network", repo=repo, sha=sha, sparse=bool(variant)) as span:
+            if variant:
+                cached_dir, downloaded = download_template_subtree(repo, version, sha, cache, template_config, variant)
+            else:
+                cached_dir, downloaded = download_template(repo, version, sha, cache)
+            span["downloaded_bytes"] = downloaded
     except subprocess.CalledProcessError as e:
-        print(f"Error running cookiecutter: {e}")
+        print(f"Error fetching template: {e}")
+        print(f"stderr: {e.stderr}")
         sys.exit(1)
 
+    return cached_dir
+
+
+def download_template(repo: str, version: str, sha: str, cache: TemplateCache) -> tuple[Path, int]:
+    """
+    Fetch repo@sha into the template cache.
+
+    Returns the cache entry and the number of bytes downloaded (size of the fetched git objects).
+    Raises subprocess.CalledProcessError if git fails.
+    """
+    staging_dir = cache.new_staging_dir()
+    try:
+        # Fetch the single commit (shallow) instead of cloning the branch history
+        for cmd in (
+            ["git", "init", "--quiet"],
+            ["git", "fetch", "--quiet", "--depth", "1", repo, sha],
+            ["git", "checkout", "--quiet", "--detach", "FETCH_HEAD"],
+        ):
+            run_command(cmd, cwd=staging_dir, timeout=GIT_TIMEOUT_SECONDS, check=True)
+    except subprocess.CalledProcessError:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    downloaded = directory_size(staging_dir / ".git" / "objects")
+
+    # Cache entries are plain checkouts - the monorepo is the only git repo
+    shutil.rmtree(staging_dir / ".git")
+
+    return cache.store(repo, version, sha, staging_dir), downloaded
+
+
+def template_subtree_variant(template_config: dict[str, Any]) -> Optional[str]:
+    """
+    Cache variant for a partial checkout of a nested cookiecutter template, or None.
+
+    Partial checkouts need to know the rendered directory names up front, so they are only used
+    for non-interactive templates (with defaults) that set integrate_path, when cookiecutter can be
+    imported to compute the context. Set `sparse: false` on a template whose hooks need the
+    sibling projects.
+    """
+    if "integrate_path" not in template_config or "defaults" not in template_config:
+        return None
+    if not template_config.get("sparse", True):
+        return None
+    try:
+        import cookiecutter  # noqa: F401
+    except ImportError:
+        return None
+
+    selection = json.dumps(
+        [template_config["integrate_path"], template_config["defaults"]], sort_keys=True, default=str
+    )
+    return "subtree-" + hashlib.sha256(selection.encode()).hexdigest()[:12]
+
+
+def find_template_subtree(
+    template_dir: Path, template_dirs: list[str], template_config: dict[str, Any]
+) -> Optional[str]:
+    """
+    Map integrate_path (a path in the rendered output) to the template directory that renders it.
+
+    template_dirs lists every directory of the template as a POSIX path relative to its root, e.g.
+    "<workspace dir>/<project dir>" with the cookiecutter variables still unrendered. Only
+    template_dir/cookiecutter.json needs to be present. Returns None if no directory matches.
+    """
+    import posixpath
+
+    from cookiecutter.config import get_user_config
+    from cookiecutter.environment import StrictEnvironment
+    from cookiecutter.generate import generate_context
+    from cookiecutter.prompt import prompt_for_config
+
+    try:
+        context = generate_context(
+            context_file=str(template_dir / "cookiecutter.json"),
+            default_context=get_user_config().get("default_context"),
+            extra_context=template_config["defaults"],
+        )
+        variables = prompt_for_config(context, no_input=True)
+    except Exception as e:
+        print(f"  Warning: Could not compute template context for a partial checkout: {e}")
+        return None
+
+    # The generated project slug (the rendered project_slug variable, or derived from project_name)
+    project_slug = variables.get("project_slug") or str(variables.get("project_name", ""))
+    project_slug = project_slug.lower().replace(" ", "-").replace("_", "-")
+    integrate_path = template_config["integrate_path"].replace("{project_slug}", project_slug)
+
+    env = StrictEnvironment(context={"cookiecutter": variables}, keep_trailing_newline=True)
+
+    def render(name: str) -> Optional[str]:
+        try:
+            return env.from_string(name).render(cookiecutter=variables)
+        except Exception:
+            return None
+
+    current = ""
+    for part in Path(integrate_path).parts:
+        children = [d for d in template_dirs if posixpath.dirname(d) == current]
+        match = next((d for d in children if render(posixpath.basename(d)) == part), None)
+        if match is None:
+            return None
+        current = match
+
+    return current or None
+
+
+def download_template_subtree(
+    repo: str, version: str, sha: str, cache: TemplateCache, template_config: dict[str, Any], variant: str
+) -> tuple[Path, int]:
+    """
+    Fetch only the part of a nested template that integrate_path extracts.
+
+    Uses a blob-less partial clone: commits and trees are fetched up front, file contents only for
+    the paths that are checked out. The sparse checkout (cone mode) holds the top-level template files
+    (cookiecutter.json, hooks/) and the integrated subtree; sibling projects are never downloaded.
+    Falls back to a full checkout (stored as a regular entry) if the subtree can't be determined.
+    Raises subprocess.CalledProcessError if git fails.
+    """
+    staging_dir = cache.new_staging_dir()
+
+    def git(*args: str) -> str:
+        lines: list[str] = []
+        run_command(["git", *args], cwd=staging_dir, timeout=GIT_TIMEOUT_SECONDS, on_line=lines.append, check=True)
+        return "\n".join(lines)
+
+    try:
+        git("init", "--quiet")
+        git("remote", "add", "origin", repo)
+        git("fetch", "--quiet", "--filter=blob:none", "--depth", "1", "origin", sha)
+        git("sparse-checkout", "set", "--cone", "hooks")
+        git("checkout", "--quiet", "--detach", "FETCH_HEAD")
+
+        template_dirs = git("ls-tree", "-r", "-d", "--name-only", "-z", "FETCH_HEAD").split("\0")
+        subtree = find_template_subtree(staging_dir, [d for d in template_dirs if d], template_config)
+        if subtree:
+            print(f"  Partial checkout: {subtree}/")
+            git("sparse-checkout", "add", subtree)
+        else:
+            print("  Warning: integrate_path not found in template, checking out the full template")
+            git("sparse-checkout", "disable")
+    except subprocess.CalledProcessError:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    downloaded = directory_size(staging_dir / ".git" / "objects")
+    shutil.rmtree(staging_dir / ".git")
+
+    if subtree:
+        return cache.store(repo, version, sha, staging_dir, variant=variant, subtree=subtree), downloaded
+    return cache.store(repo, version, sha, staging_dir), downloaded
+
+
+def link_template_subtree(
+    cached_dir: Path,
+    template_config: dict[str, Any],
+    repo: str,
+    version: str,
+    sha: str,
+    cache: TemplateCache,
+    variant: str,
+) -> Path:
+    """
+    Derive a partial cache entry from a full one, using hard links (no file contents are copied).
+
+    Mirrors the cone-mode sparse checkout of download_template_subtree. Returns the full entry if
+    the subtree can't be determined.
+    """
+    template_dirs = [
+        Path(root).relative_to(cached_dir).as_posix()
+        for root, _dirs, _files in os.walk(cached_dir)
+        if root != str(cached_dir)
+    ]
+    subtree = find_template_subtree(cached_dir, template_dirs, template_config)
+    if not subtree:
+        return cached_dir
+
+    def link(src: str, dst: str) -> None:
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+    staging_dir = cache.new_staging_dir()
+
+    # Files directly in the root and in each parent of the subtree, plus hooks/ and the subtree itself
+    parents = [cached_dir]
+    for part in Path(subtree).parent.parts:
+        parents.append(parents[-1] / part)
+    for parent in parents:
+        dest_parent = staging_dir / parent.relative_to(cached_dir)
+        dest_parent.mkdir(parents=True, exist_ok=True)
+        for entry in parent.iterdir():
+            if entry.is_file():
+                link(str(entry), str(dest_parent / entry.name))
+    for full_dir in ("hooks", subtree):
+        if (cached_dir / full_dir).is_dir():
+            shutil.copytree(cached_dir / full_dir, staging_dir / full_dir, copy_function=link, symlinks=True)
+
+    print(f"  Partial checkout: {subtree}/")
+    return cache.store(repo, version, sha, staging_dir, variant=variant, subtree=subtree)
+
+
+def run_cookiecutter(
+    template_config: dict[str, Any], project_name: str, target_dir: Path, template_dir: Path, engine: str = "auto"
+) -> Path:
+    """
+    Run cookiecutter with the external template (from its local checkout in the template cache)
+
+    engine selects how cookiecutter runs (see COOKIECUTTER_ENGINES): "in-process" calls the
+    cookiecutter Python API and gets the generated directory back directly, "subprocess" runs the
+    cookiecutter command. "auto" uses the API whenever cookiecutter can be imported.
+    """
+    repo = template_config["repo"]
+    version = template_config.get("version", "main")
+
+    print(f"Generating project from template: {repo} @ {version}")
+    print(f"Target directory: {target_dir}")
+
+    if engine == "auto":
+        try:
+            import cookiecutter  # noqa: F401
+
+            engine = "in-process"
+        except ImportError:
+            engine = "subprocess"
+
+    generated_path: Optional[Path] = None
+    with TRACER.span("cookiecutter", category="generate", engine=engine):
+        if engine == "in-process":
+            generated_path = render_cookiecutter_in_process(template_config, target_dir, template_dir)
+        else:
+            render_cookiecutter_subprocess(template_config, target_dir, template_dir)
+
     # Find the generated project directory
     # If integrate_path is specified, use it to locate the specific subdirectory
     if "integrate_path" in template_config:
@@ -100,6 +794,8 @@ def run_cookiecutter(template_config: dict[str, Any], project_name: str, target_
             return full_path
         else:
             print(f"Warning: integrate_path '{integrate_path}' not found at {full_path}")
+            if generated_path:
+                return generated_path
             # Fall back to finding the generated directory
             generated_dirs = [d for d in target_dir.iterdir() if d.is_dir() and project_slug in d.name.lower()]
             if generated_dirs:
@@ -108,6 +804,9 @@ def run_cookiecutter(template_config: dict[str, Any], project_name: str, target_
                 print(f"Warning: Could not find generated project in {target_dir}")
                 return target_dir
 
+    if generated_path:
+        return generated_path
+
     # Default behavior: find directory matching project name
     generated_dirs = [d for d in target_dir.iterdir() if d.is_dir() and project_name.lower() in d.name.lower()]
 
@@ -119,11 +818,54 @@ def run_cookiecutter(template_config: dict[str, Any], project_name: str, target_
     return generated_dirs[0]
 
 
-def clone_github_template(template_config: dict[str, Any], project_name: str, target_dir: Path) -> Path:
-    """Clone a GitHub template repository directly (non-cookiecutter)"""
-    import shutil
-    import tempfile
+def render_cookiecutter_in_process(template_config: dict[str, Any], target_dir: Path, template_dir: Path) -> Path:
+    """Render the template with the cookiecutter Python API, returning the generated directory"""
+    from cookiecutter.exceptions import CookiecutterException
+    from cookiecutter.main import cookiecutter
+
+    defaults = template_config.get("defaults")
+    try:
+        generated = cookiecutter(
+            str(template_dir),
+            no_input=defaults is not None,
+            extra_context=defaults,
+            output_dir=str(target_dir),
+        )
+    except CookiecutterException as e:
+        print(f"Error running cookiecutter: {e}")
+        sys.exit(1)
+
+    return Path(generated)
+
+
+def render_cookiecutter_subprocess(template_config: dict[str, Any], target_dir: Path, template_dir: Path) -> None:
+    """Render the template by running the cookiecutter command"""
+    # Build cookiecutter command (the template is rendered from the cached checkout, so
+    # cookiecutter doesn't need to clone it again)
+    cmd = [
+        "cookiecutter",
+        str(template_dir),
+        f"--output-dir={target_dir}",
+    ]
+
+    # Add defaults if provided
+    if "defaults" in template_config:
+        cmd.append("--no-input")
+        # Pass defaults as extra context
+        for key, value in template_config["defaults"].items():
+            cmd.append(f"{key}={value}")
+
+    try:
+        subprocess.run(cmd, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Error running cookiecutter: {e}")
+        sys.exit(1)
+
 
+def clone_github_template(
+    template_config: dict[str, Any], project_name: str, target_dir: Path, template_dir: Path
+) -> Path:
+    """Copy a GitHub template repository (non-cookiecutter) from its checkout in the template cache"""
     repo = template_config["repo"]
     version = template_config.get("version", "main")
 
@@ -134,36 +876,20 @@ def clone_github_template(template_config: dict[str, Any], project_name: str, ta
     project_slug = project_name.lower().replace(" ", "-").replace("_", "-")
     project_slug = project_slug.replace(".", "-").replace("/", "-").replace("\\", "-")
     # Remove invalid characters and clean up
-    import re
-
     project_slug = re.sub(r"[^a-z0-9-]", "-", project_slug)
     project_slug = re.sub(r"-+", "-", project_slug)
     project_slug = project_slug.strip("-")
 
     final_path = target_dir / project_slug
 
-    # Clone to temporary directory first
-    with tempfile.TemporaryDirectory() as tmpdir:
-        tmp_path = Path(tmpdir) / "template"
-
-        print("  Cloning repository...")
-        try:
-            # Clone the specific branch
-            subprocess.run(
-                ["git", "clone", "--branch", version, "--depth", "1", repo, str(tmp_path)],
-                check=True,
-                capture_output=True,
-                text=True,
-            )
-        except subprocess.CalledProcessError as e:
-            print(f"Error cloning repository: {e}")
-            print(f"stderr: {e.stderr}")
-            sys.exit(1)
-
-        # Remove .git directory from cloned template
-        git_dir = tmp_path / ".git"
-        if git_dir.exists():
-            shutil.rmtree(git_dir)
+    # Stage the project next to its final location (same filesystem), so it can be published
+    # with a single rename and an interrupted run never leaves a half-written project behind
+    staging_path = target_dir / f".{project_slug}.staging-{uuid.uuid4().hex}"
+    try:
+        print("  Copying template...")
+        with TRACER.span("copy template", category="generate") as span:
+            shutil.copytree(template_dir, staging_path)
+            span["bytes"] = directory_size(staging_path)
 
         # Apply customizations (always include project_name and project_slug)
         customizations = template_config.get("customizations", {}).copy()
@@ -171,64 +897,205 @@ def clone_github_template(template_config: dict[str, Any], project_name: str, ta
         customizations["project_slug"] = project_slug
 
         print("  Applying customizations...")
-        apply_customizations(tmp_path, customizations)
+        with TRACER.span("customize", category="generate", keys=len(customizations)):
+            apply_customizations(staging_path, customizations, load_placeholder_index(template_dir))
 
-        # Copy to final location
-        if final_path.exists():
-            print(f"  Warning: {final_path} already exists, removing...")
-            shutil.rmtree(final_path)
-
-        shutil.copytree(tmp_path, final_path)
-        print(f"  ✓ Created project at {final_path.relative_to(target_dir.parent)}")
+        with TRACER.span("publish", category="generate"):
+            publish_directory(staging_path, final_path)
+    except BaseException:
+        shutil.rmtree(staging_path, ignore_errors=True)
+        raise
 
+    print(f"  ✓ Created project at {final_path.relative_to(target_dir.parent)}")
     return final_path
 
 
-def apply_customizations(project_path: Path, customizations: dict[str, str]) -> None:
-    """Apply simple text replacements to customize a GitHub template"""
-    import json
+def publish_directory(staging_path: Path, final_path: Path) -> None:
+    """
+    Move a fully populated staging directory to final_path with an atomic rename.
+
+    staging_path must be on the same filesystem as final_path. An existing final_path is
+    renamed aside first and only deleted once the new directory is in place.
+    """
+    if not final_path.exists():
+        os.rename(staging_path, final_path)
+        return
 
-    # Files to customize (common configuration files)
-    customizable_files = [
-        "package.json",
-        "README.md",
-        "vite.config.ts",
-        "vite.config.js",
-        "tsconfig.json",
-    ]
+    print(f"  Warning: {final_path} already exists, replacing...")
+    replaced_path = final_path.with_name(f".{final_path.name}.replaced-{uuid.uuid4().hex}")
+    os.rename(final_path, replaced_path)
+    os.rename(staging_path, final_path)
+    shutil.rmtree(replaced_path, ignore_errors=True)
 
-    for file_name in customizable_files:
-        file_path = project_path / file_name
-        if not file_path.exists():
-            continue
 
-        try:
-            content = file_path.read_text()
-            original_content = content
-
-            # For package.json, update the name field properly
-            if file_name == "package.json":
-                try:
-                    pkg_data = json.loads(content)
-                    if "project_name" in customizations:
-                        pkg_data["name"] = customizations["project_slug"]
-                    content = json.dumps(pkg_data, indent=2) + "\n"
-                except json.JSONDecodeError:
-                    # Fall back to text replacement if JSON is invalid
-                    pass
-
-            # Apply text replacements
-            for key, value in customizations.items():
-                # Replace {key} placeholders
-                placeholder = "{" + key + "}"
-                content = content.replace(placeholder, value)
-
-            if content != original_content:
-                file_path.write_text(content)
-                print(f"    Customized {file_name}")
+def apply_customizations(
+    project_path: Path, customizations: dict[str, Any], index: Optional[dict[str, list[list[Any]]]] = None
+) -> None:
+    """
+    Replace {key} placeholders with customization values in every text file of a GitHub template.
+
+    With the template's placeholder index (see load_placeholder_index), only files that contain one
+    of the keys are opened, and values are spliced in at the recorded offsets. Without it, all keys
+    are compiled into one pattern and every file is scanned once. Binary files are skipped and large
+    files are memory-mapped instead of read.
+    """
+    pattern = placeholder_pattern(customizations)
+    values = {key.encode(): str(value).encode() for key, value in customizations.items()}
+    customized = set()
 
+    # For package.json, update the name field properly
+    package_json_path = project_path / "package.json"
+    if package_json_path.exists() and "project_name" in customizations:
+        try:
+            content = package_json_path.read_text()
+            pkg_data = json.loads(content)
+            pkg_data["name"] = customizations["project_slug"]
+            new_content = json.dumps(pkg_data, indent=2) + "\n"
+            if new_content != content:
+                package_json_path.write_text(new_content)
+                customized.add("package.json")
+        except json.JSONDecodeError:
+            # Fall back to text replacement if JSON is invalid
+            pass
         except Exception as e:
-            print(f"    Warning: Could not customize {file_name}: {e}")
+            print(f"    Warning: Could not customize package.json: {e}")
+
+    # The index only records placeholder names made of PLACEHOLDER_NAME_PATTERN characters
+    if index is not None and not all(PLACEHOLDER_NAME_PATTERN.fullmatch(str(key)) for key in customizations):
+        index = None
+
+    if index is not None:
+        candidates = [
+            (rel_path, occurrences)
+            for rel_path, occurrences in index.items()
+            if any(name.encode() in values for _offset, name in occurrences)
+        ]
+    else:
+        candidates = [(rel_path, None) for rel_path in walk_template_files(project_path)]
+
+    for rel_path, occurrences in candidates:
+        file_path = project_path / rel_path
+        try:
+            # Offsets in package.json are stale once its name field has been rewritten
+            if occurrences is not None and rel_path not in customized:
+                changed = substitute_indexed_placeholders(file_path, occurrences, values)
+            else:
+                changed = substitute_placeholders(file_path, pattern, values)
+        except OSError as e:
+            print(f"    Warning: Could not customize {rel_path}: {e}")
+            continue
+
+        if changed:
+            customized.add(rel_path)
+
+    for rel_path in sorted(customized):
+        print(f"    Customized {rel_path}")
+
+
+def walk_template_files(template_dir: Path) -> list[str]:
+    """Relative paths of all regular files in a template checkout (without .git and symlinks)"""
+    rel_paths = []
+    for directory, dir_names, file_names in os.walk(template_dir):
+        dir_names[:] = sorted(name for name in dir_names if name != ".git")
+        for file_name in sorted(file_names):
+            file_path = Path(directory) / file_name
+            if not file_path.is_symlink():
+                rel_paths.append(file_path.relative_to(template_dir).as_posix())
+    return rel_paths
+
+
+@contextlib.contextmanager
+def open_text_bytes(file_path: Path) -> Iterator[Optional[Any]]:
+    """
+    Open a template file for scanning, yielding its bytes, or None if it is binary.
+
+    Files with a NUL byte near the start are treated as binary. Large files are yielded as a
+    read-only memory mapping, so files without placeholders are never copied into memory.
+    """
+    import mmap
+
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size >= CUSTOMIZE_MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                yield None if b"\0" in content[:BINARY_SNIFF_BYTES] else content
+        else:
+            content = f.read()
+            yield None if b"\0" in content[:BINARY_SNIFF_BYTES] else content
+
+
+def placeholder_pattern(customizations: dict[str, Any]) -> re.Pattern[bytes]:
+    """Compile the {key} placeholders of all customization keys into a single bytes pattern"""
+    alternatives = b"|".join(re.escape(str(key).encode()) for key in customizations)
+    return re.compile(rb"\{(" + alternatives + rb")\}")
+
+
+def substitute_placeholders(file_path: Path, pattern: re.Pattern[bytes], values: dict[bytes, bytes]) -> bool:
+    """Replace placeholders in one file in a single scan. Returns True if the file was changed"""
+    with open_text_bytes(file_path) as content:
+        if content is None or not pattern.search(content):
+            return False
+        new_content = pattern.sub(lambda match: values[match.group(1)], content)
+
+    file_path.write_bytes(new_content)
+    return True
+
+
+def substitute_indexed_placeholders(file_path: Path, occurrences: list[list[Any]], values: dict[bytes, bytes]) -> bool:
+    """Splice values in at the placeholder offsets recorded in the index. Returns True if the file was changed"""
+    content = file_path.read_bytes()
+    parts = []
+    position = 0
+    for offset, name in occurrences:
+        key = name.encode()
+        if key not in values:
+            continue
+        parts.append(content[position:offset])
+        parts.append(values[key])
+        position = offset + len(key) + 2
+
+    if not parts:
+        return False
+
+    parts.append(content[position:])
+    file_path.write_bytes(b"".join(parts))
+    return True
+
+
+def load_placeholder_index(template_dir: Path) -> dict[str, list[list[Any]]]:
+    """
+    Placeholder occurrences in a cached template checkout: {relative path: [[offset, name], ...]}.
+
+    Cache entries never change, so the index is built the first time a template commit is used and
+    stored next to the entry (<key>.placeholders). Binary files are not indexed.
+    """
+    index_path = template_dir.with_name(f"{template_dir.name}.placeholders")
+    try:
+        return json.loads(index_path.read_text())
+    except (
+        OSError,
+        json.JSONDecodeError,
+    ):
+        pass
+
+    index = {}
+    for rel_path in walk_template_files(template_dir):
+        with open_text_bytes(template_dir / rel_path) as content:
+            if content is None:
+                continue
+            occurrences = [
+                [match.start(), match.group(1).decode()] for match in PLACEHOLDER_TOKEN_PATTERN.finditer(content)
+            ]
+        if occurrences:
+            index[rel_path] = occurrences
+
+    try:
+        tmp_path = index_path.with_name(f"{index_path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(json.dumps(index) + "\n")
+        os.replace(tmp_path, index_path)
+    except OSError as e:
+        print(f"  Warning: Could not store placeholder index: {e}")
+
+    return index
 
 
 def move_nested_project(project_path: Path, target_dir: Path) -> Path:
@@ -240,8 +1107,6 @@ def move_nested_project(project_path: Path, target_dir: Path) -> Path:
     - Output: apps/test-cli
     - Cleanup: Remove apps/test-cli-workspace
     """
-    import shutil
-
     # Only move if project_path has a parent directory that isn't the target_dir
     if project_path.parent != target_dir:
         final_path = target_dir / project_path.name
@@ -268,28 +1133,29 @@ def move_nested_project(project_path: Path, target_dir: Path) -> Path:
     return project_path
 
 
-def generate_webstorm_run_configs(project_path: Path, monorepo_root: Path) -> None:
+def generate_webstorm_run_configs(
+    project_path: Path, monorepo_root: Path, output: Optional[TextIO] = None
+) -> dict[str, str]:
     """
     Generate WebStorm run configurations for TypeScript/JavaScript projects.
 
-    Creates .run/*.run.xml files based on package.json scripts.
+    Creates .run/*.run.xml files based on package.json scripts. Returns the created files' contents
+    by file name. Progress is printed to output (default: sys.stdout).
     """
-    import json
-
     package_json_path = project_path / "package.json"
     if not package_json_path.exists():
-        return
+        return {}
 
     try:
         with open(package_json_path) as f:
             package_data = json.load(f)
     except json.JSONDecodeError:
-        print("  Warning: Could not parse package.json for run configurations")
-        return
+        print("  Warning: Could not parse package.json for run configurations", file=output)
+        return {}
 
     scripts = package_data.get("scripts", {})
     if not scripts:
-        return
+        return {}
 
     # Determine which scripts to create run configurations for
     # Map script names to display names and whether they should be created
@@ -315,6 +1181,7 @@ def generate_webstorm_run_configs(project_path: Path, monorepo_root: Path) -> No
     project_rel_path = project_path.relative_to(monorepo_root)
 
     configs_created = []
+    written = {}
 
     for script_name, (display_name, should_create) in script_configs.items():
         if script_name not in scripts or not should_create:
@@ -342,68 +1209,704 @@ def generate_webstorm_run_configs(project_path: Path, monorepo_root: Path) -> No
 
         config_path.write_text(config_content)
         configs_created.append(display_name)
+        written[config_filename] = config_content
 
     if configs_created:
-        print(f"  Created {len(configs_created)} WebStorm run configuration(s): {', '.join(configs_created)}")
+        print(
+            f"  Created {len(configs_created)} WebStorm run configuration(s): {', '.join(configs_created)}", file=output
+        )
 
+    return written
 
-def integrate_project(project_path: Path, monorepo_root: Path) -> None:
+
+class GitAttributes:
     """
-    Integrate the generated project with monorepo conventions.
+    A .gitattributes file indexed by project section and pattern.
 
-    This function demonstrates the integration pattern. Customize based on your needs.
+    Projects' attributes live in sections starting with a "# Attributes from <project path>" header and
+    ending at the next blank line. Each section maps patterns to their attributes: a pattern listed
+    twice gets one line with both lines' attributes, and comments are kept once. Everything outside
+    the sections is kept as it is. Merging a project again replaces its section in place.
+    """
 
-    Integration tasks:
-    1. Remove git repository (monorepo is the only git repo)
-    2. Keep project documentation (README.md, docs/, CONTRIBUTING.md, etc.)
-    3. Handle LICENSE files (keep and warn if different from monorepo)
-    4. Merge .gitattributes to monorepo config (with path prefixes)
-    5. Merge pre-commit hooks to monorepo config (with file patterns)
-    6. Migrate GitHub workflows to monorepo (with path filters)
-    7. Fix git-based versioning (hatch-vcs, setuptools-scm)
-    8. Detect project type (Python vs TypeScript)
-    9. Remove duplicate configs (use monorepo's shared configs instead)
-    10. Add to appropriate workspace (uv for Python, npm/pnpm for TypeScript)
-    11. Update workspace configuration
-    """
-    import shutil
+    SECTION_HEADER = "# Attributes from "
+
+    def __init__(self, content: str = "") -> None:
+        # Lines outside the sections; a section is represented by its header line
+        self.lines: list[str] = []
+        # Project path: {pattern (or comment line): attributes (None for comments)}
+        self.sections: dict[str, dict[str, Optional[str]]] = {}
+
+        section = None
+        for line in content.rstrip("\n").split("\n") if content.strip() else []:
+            if line.startswith(self.SECTION_HEADER):
+                name = line[len(self.SECTION_HEADER) :].strip()
+                if name not in self.sections:
+                    self.lines.append(self.SECTION_HEADER + name)
+                section = self.sections.setdefault(name, {})
+            elif section is not None and line.strip():
+                self._add(section, line)
+            else:
+                section = None
+                self.lines.append(line)
+
+    @staticmethod
+    def _add(section: dict[str, Optional[str]], line: str) -> None:
+        line = line.strip()
+        parts = line.split(None, 1)
+        if line.startswith("#") or len(parts) < 2:
+            section[line] = None
+            return
+
+        pattern, attrs = parts
+        previous = section.get(pattern)
+        if previous:
+            # Repeated pattern: later attributes override earlier ones of the same name
+            tokens = previous.split() + attrs.split()
+            names = [token.lstrip("-!").split("=", 1)[0] for token in tokens]
+            attrs = " ".join(token for index, token in enumerate(tokens) if names[index] not in names[index + 1 :])
+        section[pattern] = attrs
+
+    def section_lines(self, name: str) -> list[str]:
+        """A project's section as lines, without the header"""
+        return [pattern if attrs is None else f"{pattern} {attrs}" for pattern, attrs in self.sections[name].items()]
+
+    def set_section(self, name: str, lines: list[str]) -> bool:
+        """Add or replace a project's section, returning whether the file changed"""
+        section: dict[str, Optional[str]] = {}
+        for line in lines:
+            self._add(section, line)
+        if self.sections.get(name) == section:
+            return False
+
+        if name not in self.sections:
+            if self.lines and self.lines[-1].strip():
+                self.lines.append("")
+            self.lines.append(self.SECTION_HEADER + name)
+        self.sections[name] = section
+        return True
+
+    def remove_section(self, name: str) -> bool:
+        """Remove a project's section, returning whether it existed"""
+        if name not in self.sections:
+            return False
+        del self.sections[name]
+        index = self.lines.index(self.SECTION_HEADER + name)
+        # Drop the blank line separating it from the previous content
+        start = index - 1 if index > 0 and not self.lines[index - 1].strip() else index
+        del self.lines[start : index + 1]
+        return True
+
+    def render(self) -> str:
+        output = []
+        for line in self.lines:
+            name = line[len(self.SECTION_HEADER) :] if line.startswith(self.SECTION_HEADER) else None
+            output.append(line)
+            if name in self.sections:
+                output.extend(self.section_lines(name))
+        return "\n".join(output) + "\n" if output else ""
+
+
+def hook_scopes(hook: dict[str, Any]) -> Optional[list[str]]:
+    """
+    Project paths a pre-commit hook is limited to by its files regex (^apps/x/ or
+    ^(?:apps/x|apps/y)/), None if it has no files regex or a different one.
+    """
+    match = HOOK_SCOPE_PATTERN.fullmatch(hook.get("files") or "")
+    if not match:
+        return None
+    return (match.group(1) or match.group(2)).split("|")
 
-    print(f"\nIntegrating {project_path.name} into monorepo...")
 
-    # 1. Remove git repository (monorepo should be the only git repo)
-    git_dir = project_path / ".git"
-    if git_dir.exists():
-        shutil.rmtree(git_dir)
-        print("  Removed .git directory (using monorepo's git)")
+def hook_scope_regex(scopes: list[str]) -> str:
+    """files regex limiting a pre-commit hook to the given project paths"""
+    scopes = sorted(set(scopes))
+    return f"^{scopes[0]}/" if len(scopes) == 1 else f"^(?:{'|'.join(scopes)})/"
 
-    # Keep .gitignore - project-specific ignores are useful!
-    gitignore_path = project_path / ".gitignore"
-    if gitignore_path.exists():
-        print("  Kept .gitignore (project-specific ignores)")
 
-    # 2. Keep project documentation files
-    doc_files = ["README.md", "CONTRIBUTING.md", "CHANGELOG.md", "CODE_OF_CONDUCT.md"]
-    kept_docs = []
-    for doc_file in doc_files:
-        doc_path = project_path / doc_file
-        if doc_path.exists():
-            kept_docs.append(doc_file)
-
-    docs_dir = project_path / "docs"
-    if docs_dir.exists() and docs_dir.is_dir():
-        kept_docs.append("docs/")
+class PreCommitConfig:
+    """
+    A .pre-commit-config.yaml with an index of its repos and hooks, kept across merges.
 
-    if kept_docs:
-        print(f"  Kept project documentation: {', '.join(kept_docs)}")
+    Hooks are indexed by repo, rev and their settings other than files, and hooks limited to
+    project directories (see hook_scopes) by the projects they cover, so merging a project looks up
+    only what it touches instead of scanning the whole config. The files regexes of changed hooks
+    are rebuilt once, by dump().
+    """
 
-    # 3. Handle LICENSE file
-    license_path = project_path / "LICENSE"
-    monorepo_license = monorepo_root / "LICENSE"
+    def __init__(self, config: dict[str, Any]) -> None:
+        self.config = config
+        self.config.setdefault("repos", [])
+        # (repo, rev): repo entry new hooks are added to
+        self._repos: dict[tuple[Any, Any], dict[str, Any]] = {}
+        # (repo, rev, settings): hooks
+        self._hooks: dict[tuple[Any, Any, str], list[dict[str, Any]]] = {}
+        # id(hook): repo entry, for the hooks of all repos
+        self._repo_of: dict[int, dict[str, Any]] = {}
+        # id(hook): project paths it is limited to, for project-scoped hooks
+        self._scopes: dict[int, set[str]] = {}
+        # Project path: project-scoped hooks covering it
+        self._projects: dict[str, list[dict[str, Any]]] = {}
+        # id(hook): project-scoped hooks whose files regex is out of date
+        self._dirty: dict[int, dict[str, Any]] = {}
+
+        for repo in self.config["repos"]:
+            self._repos.setdefault((repo.get("repo"), repo.get("rev")), repo)
+            for hook in repo.get("hooks", []):
+                self._index(repo, hook)
+
+    @staticmethod
+    def _key(repo: dict[str, Any], hook: dict[str, Any]) -> tuple[Any, Any, str]:
+        settings = {key: value for key, value in hook.items() if key != "files"}
+        return repo.get("repo"), repo.get("rev"), json.dumps(settings, sort_keys=True, default=str)
+
+    def _index(self, repo: dict[str, Any], hook: dict[str, Any]) -> None:
+        self._hooks.setdefault(self._key(repo, hook), []).append(hook)
+        self._repo_of[id(hook)] = repo
+        scopes = hook_scopes(hook)
+        if scopes is not None:
+            self._scopes[id(hook)] = set(scopes)
+            for scope in scopes:
+                self._projects.setdefault(scope, []).append(hook)
+
+    def _remove(self, hook: dict[str, Any]) -> None:
+        repo = self._repo_of.pop(id(hook))
+        self._hooks[self._key(repo, hook)].remove(hook)
+        del self._scopes[id(hook)]
+        self._dirty.pop(id(hook), None)
+        repo["hooks"].remove(hook)
+        if not repo["hooks"]:
+            self.config["repos"].remove(repo)
+            if self._repos.get((repo.get("repo"), repo.get("rev"))) is repo:
+                del self._repos[(repo.get("repo"), repo.get("rev"))]
+
+    def merge_project(self, scope: str, repos: list[dict[str, Any]]) -> tuple[bool, int]:
+        """
+        Merge a project's hooks (already limited to its directory, scope), replacing the hooks it
+        merged before. Identical hooks of several projects become one entry whose files regex
+        matches all their directories.
+
+        Returns whether the config changed and how many hooks are shared with other projects.
+        """
+        changed = False
+        shared = 0
+
+        # Take the project out of its earlier hooks; those it still has are added back below
+        touched = {id(hook): hook for hook in self._projects.pop(scope, [])}
+        for hook in touched.values():
+            self._scopes[id(hook)].discard(scope)
+        previous = set(touched)
+        current = set()
+
+        for repo in repos:
+            for hook in repo.get("hooks", []):
+                candidates = self._hooks.get(self._key(repo, hook), [])
+                if any("files" not in candidate for candidate in candidates):
+                    # The monorepo already runs this hook on all files
+                    continue
+
+                hook_scope = hook_scopes(hook)
+                target = next((c for c in candidates if id(c) in self._scopes), None) if hook_scope else None
+                if hook_scope and target is not None:
+                    # Same hook from another project: extend its files regex
+                    if self._scopes[id(target)]:
+                        shared += 1
+                    self._scopes[id(target)].update(hook_scope)
+                    for path in hook_scope:
+                        self._projects.setdefault(path, []).append(target)
+                    touched[id(target)] = target
+                    current.add(id(target))
+                    continue
+                if any(candidate.get("files") == hook.get("files") for candidate in candidates):
+                    continue
+
+                repo_entry = self._repos.get((repo.get("repo"), repo.get("rev")))
+                if repo_entry is None:
+                    repo_entry = {key: value for key, value in repo.items() if key != "hooks"}
+                    repo_entry["hooks"] = []
+                    self.config["repos"].append(repo_entry)
+                    self._repos[(repo.get("repo"), repo.get("rev"))] = repo_entry
+                hook = dict(hook)
+                repo_entry.setdefault("hooks", []).append(hook)
+                self._index(repo_entry, hook)
+                changed = True
+
+        # Drop hooks no project uses anymore; the others get their new files regex in dump()
+        for hook in touched.values():
+            if self._scopes[id(hook)]:
+                self._dirty[id(hook)] = hook
+            else:
+                self._remove(hook)
+                changed = True
 
-    if license_path.exists():
-        print("  Kept LICENSE file")
+        return changed or previous != current, shared
 
-        # Warn if license differs from monorepo
+    def dump(self) -> dict[str, Any]:
+        """The config, with up to date files regexes"""
+        for hook in self._dirty.values():
+            hook["files"] = hook_scope_regex(list(self._scopes[id(hook)]))
+        self._dirty.clear()
+        return self.config
+
+
+def actions_expression(expression: str) -> str:
+    """A GitHub Actions expression (dollar sign and double braces around it)"""
+    return "$" + "{" * 2 + f" {expression} " + "}" * 2
+
+
+def dump_workflow(workflow: dict[str, Any]) -> str:
+    """A workflow as YAML, with multi-line strings (run scripts) as literal blocks"""
+
+    class WorkflowDumper(yaml.SafeDumper):
+        pass
+
+    def represent_str(dumper: yaml.SafeDumper, data: str) -> Any:
+        return dumper.represent_scalar("tag:yaml.org,2002:str", data, style="|" if "\n" in data else None)
+
+    WorkflowDumper.add_representer(str, represent_str)
+    return yaml.dump(workflow, Dumper=WorkflowDumper, default_flow_style=False, sort_keys=False, width=120)
+
+
+class WorkflowMatrix:
+    """
+    The generated workflow running all projects' CI jobs ("workflows: matrix" integration mode).
+
+    Jobs with identical definitions (after folding in their workflow's env, defaults and
+    permissions) are grouped across projects. The generated workflow has one matrix job per group,
+    run in each project's directory; a first "changes" job works out which projects a push or pull
+    request affects (with scripts/monorepo.py affected), and each group's matrix covers only those.
+    The groups are kept in .monorepo/workflow-matrix.json, from which the workflow is regenerated.
+    """
+
+    def __init__(self, state: Optional[dict[str, Any]] = None) -> None:
+        # Group id: {"id": original job id, "job": definition, "needs": group ids, "projects": paths}
+        self.groups: dict[str, dict[str, Any]] = dict((state or {}).get("groups", {}))
+
+    def remove_project(self, project: str) -> bool:
+        """Take a project out of all groups, returning whether it was in any"""
+        changed = False
+        for group_id in list(self.groups):
+            projects = self.groups[group_id]["projects"]
+            if project in projects:
+                projects.remove(project)
+                changed = True
+                if not projects:
+                    del self.groups[group_id]
+        return changed
+
+    def add_project(self, project: str, workflows: dict[str, str]) -> bool:
+        """Add (or replace) the jobs of a project's workflows, returning whether the groups changed"""
+        before = json.dumps(self.groups, sort_keys=True, default=str)
+        self.remove_project(project)
+
+        for content in workflows.values():
+            workflow = yaml.safe_load(content) or {}
+            jobs = workflow.get("jobs") or {}
+            shared = {key: workflow[key] for key in ("env", "defaults", "permissions") if key in workflow}
+            group_ids: dict[str, str] = {}
+
+            def group_of(job_id: str, needed_by: tuple[str, ...] = ()) -> str:
+                if job_id not in group_ids:
+                    job = dict(jobs[job_id])
+                    needs = job.pop("needs", [])
+                    needs = [needs] if isinstance(needs, str) else list(needs)
+                    for key, value in shared.items():
+                        job[key] = {**value, **job.get(key, {})} if key == "env" else job.get(key, value)
+
+                    # Jobs are grouped together with the jobs they need
+                    definition = {
+                        "job": job,
+                        "needs": [
+                            group_of(need, needed_by + (job_id,))
+                            for need in needs
+                            if need in jobs and need not in needed_by
+                        ],
+                    }
+                    digest = hashlib.sha256(json.dumps(definition, sort_keys=True, default=str).encode())
+                    group_id = f"{re.sub(r'[^A-Za-z0-9_-]', '-', job_id)}-{digest.hexdigest()[:8]}"
+                    group = self.groups.setdefault(group_id, {"id": job_id, **definition, "projects": []})
+                    if project not in group["projects"]:
+                        group["projects"] = sorted(group["projects"] + [project])
+                    group_ids[job_id] = group_id
+                return group_ids[job_id]
+
+            for job_id in jobs:
+                group_of(job_id)
+
+        return json.dumps(self.groups, sort_keys=True, default=str) != before
+
+    def state(self) -> dict[str, Any]:
+        return {"groups": dict(sorted(self.groups.items()))}
+
+    def render(self) -> str:
+        """The generated workflow"""
+        matrix_project = actions_expression("matrix.project")
+        changes = {
+            "runs-on": "ubuntu-latest",
+            "outputs": {group_id: actions_expression(f"steps.affected.outputs.{group_id}") for group_id in self.groups},
+            "steps": [
+                {"uses": "actions/checkout@v4", "with": {"fetch-depth": 0}},
+                # For scripts/monorepo.py (the root pyproject.toml's requires-python)
+                {"uses": "actions/setup-python@v5", "with": {"python-version-file": "pyproject.toml"}},
+                {
+                    "name": "Find affected projects",
+                    "id": "affected",
+                    "env": {
+                        "BASE": actions_expression("github.event.pull_request.base.sha || github.event.before"),
+                        "PROJECT_GROUPS": json.dumps(
+                            {group_id: group["projects"] for group_id, group in self.groups.items()}
+                        ),
+                    },
+                    "run": AFFECTED_PROJECTS_STEP,
+                },
+            ],
+        }
+
+        jobs: dict[str, Any] = {"changes": changes}
+        for group_id, group in sorted(self.groups.items()):
+            job = json.loads(json.dumps(group["job"], default=str))
+
+            strategy = dict(job.pop("strategy", None) or {})
+            matrix = strategy.get("matrix")
+            strategy["matrix"] = {
+                **(matrix if isinstance(matrix, dict) else {}),
+                "project": actions_expression(f"fromJSON(needs.changes.outputs.{group_id})"),
+            }
+            strategy.setdefault("fail-fast", False)
+
+            defaults = job.pop("defaults", None) or {}
+            run_defaults = defaults.setdefault("run", {})
+            working_directory = run_defaults.get("working-directory")
+            run_defaults["working-directory"] = (
+                f"{matrix_project}/{working_directory}" if working_directory else matrix_project
+            )
+
+            condition = f"needs.changes.outputs.{group_id} != '[]'"
+            jobs[group_id] = {
+                "name": f"{job.pop('name', group['id'])} ({matrix_project})",
+                "needs": ["changes"] + group["needs"],
+                "if": f"({job.pop('if')}) && {condition}" if "if" in job else condition,
+                "strategy": strategy,
+                "defaults": defaults,
+                **job,
+            }
+
+        workflow = {
+            "name": "Projects",
+            "on": {"push": {"branches": ["main", "develop"]}, "pull_request": {"branches": ["main"]}},
+            "jobs": jobs,
+        }
+        header = f"# Generated by scripts/add-project.py from {WORKFLOW_MATRIX_STATE}, do not edit\n"
+        return header + dump_workflow(workflow)
+
+
+class MonorepoFiles:
+    """
+    Shared monorepo files that integration edits: .gitattributes, .pre-commit-config.yaml, the
+    root package.json, the generated matrix workflow and the project registry.
+
+    Each file is loaded on first use and edited in memory; flush() writes every changed file once.
+    This lets batch mode integrate many projects without re-reading and re-writing the shared
+    files for each of them.
+    """
+
+    def __init__(self, monorepo_root: Path) -> None:
+        self.monorepo_root = monorepo_root
+        self._gitattributes: Optional[GitAttributes] = None
+        self._precommit_config: Optional[PreCommitConfig] = None
+        self._package_json: Optional[dict[str, Any]] = None
+        self._package_json_loaded = False
+        self._workflow_matrix: Optional[WorkflowMatrix] = None
+        self._projects: Optional[dict[str, dict[str, Any]]] = None
+        self._changed: set[str] = set()
+
+    @property
+    def gitattributes(self) -> GitAttributes:
+        """Parsed root .gitattributes (call mark_changed after editing it)"""
+        if self._gitattributes is None:
+            path = self.monorepo_root / ".gitattributes"
+            self._gitattributes = GitAttributes(path.read_text() if path.exists() else "")
+        return self._gitattributes
+
+    @property
+    def precommit_config(self) -> PreCommitConfig:
+        """Parsed and indexed root .pre-commit-config.yaml (call mark_changed after editing it)"""
+        if self._precommit_config is None:
+            path = self.monorepo_root / ".pre-commit-config.yaml"
+            config = None
+            if path.exists():
+                with open(path) as f:
+                    config = yaml.safe_load(f)
+            self._precommit_config = PreCommitConfig(config or {"repos": []})
+        return self._precommit_config
+
+    @property
+    def package_json(self) -> Optional[dict[str, Any]]:
+        """Parsed root package.json, or None if there is none (call mark_changed after editing it)"""
+        if not self._package_json_loaded:
+            path = self.monorepo_root / "package.json"
+            if path.exists():
+                with open(path) as f:
+                    self._package_json = json.load(f)
+            self._package_json_loaded = True
+        return self._package_json
+
+    @property
+    def workflow_matrix(self) -> WorkflowMatrix:
+        """Job groups of the generated matrix workflow (call mark_changed(WORKFLOW_MATRIX_FILE) after editing)"""
+        if self._workflow_matrix is None:
+            path = self.monorepo_root / WORKFLOW_MATRIX_STATE
+            self._workflow_matrix = WorkflowMatrix(json.loads(path.read_text()) if path.exists() else None)
+        return self._workflow_matrix
+
+    @property
+    def projects(self) -> dict[str, dict[str, Any]]:
+        """Project registry entries by project path (call mark_changed(PROJECT_REGISTRY) after editing)"""
+        if self._projects is None:
+            path = self.monorepo_root / PROJECT_REGISTRY
+            projects: dict[str, dict[str, Any]] = json.loads(path.read_text())["projects"] if path.exists() else {}
+            self._projects = projects
+        return self._projects
+
+    def register_project(self, project_path: Path, **fields: Any) -> None:
+        """Add or update a project's registry entry (see PROJECT_REGISTRY), written by flush()"""
+        path = project_path.relative_to(self.monorepo_root).as_posix()
+        entry = self.projects.setdefault(
+            path,
+            {
+                "name": project_path.name,
+                "path": path,
+                "type": "unknown",
+                "template": None,
+                "template_sha": None,
+                "created_at": None,
+                "integration_manifest": None,
+            },
+        )
+        entry.update(fields)
+        self.mark_changed(PROJECT_REGISTRY)
+
+    def mark_changed(self, file_name: str) -> None:
+        """Record that a loaded file was edited and needs to be written by flush()"""
+        self._changed.add(file_name)
+
+    def flush(self) -> list[str]:
+        """Write all changed files, returning their names"""
+        written = sorted(self._changed)
+        with TRACER.span("write monorepo files", category="integrate", files=written):
+            for file_name in written:
+                path = self.monorepo_root / file_name
+                if file_name == ".gitattributes":
+                    path.write_text(self.gitattributes.render())
+                elif file_name == ".pre-commit-config.yaml":
+                    with open(path, "w") as f:
+                        yaml.dump(self.precommit_config.dump(), f, default_flow_style=False, sort_keys=False)
+                elif file_name == "package.json":
+                    with open(path, "w") as f:
+                        json.dump(self.package_json, f, indent=2)
+                        f.write("\n")  # Add trailing newline
+                elif file_name == WORKFLOW_MATRIX_FILE:
+                    state_path = self.monorepo_root / WORKFLOW_MATRIX_STATE
+                    if self.workflow_matrix.groups:
+                        path.parent.mkdir(parents=True, exist_ok=True)
+                        path.write_text(self.workflow_matrix.render())
+                        state_path.write_text(json.dumps(self.workflow_matrix.state(), indent=2, default=str) + "\n")
+                    else:
+                        # No project uses the matrix workflow anymore
+                        path.unlink(missing_ok=True)
+                        state_path.unlink(missing_ok=True)
+                elif file_name == PROJECT_REGISTRY:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    registry = {"projects": dict(sorted(self.projects.items()))}
+                    path.write_text(json.dumps(registry, indent=2) + "\n")
+
+        self._changed.clear()
+        return written
+
+
+@dataclass
+class ProjectFacts:
+    """
+    Snapshot of a generated project's top level, taken with a single directory scan.
+
+    Integration steps check these instead of stat()-ing paths one at a time (each stat is a round
+    trip on network filesystems). Describes the project as generated: steps that remove files don't
+    update it.
+    """
+
+    # Top-level regular files by name: size in bytes
+    files: dict[str, int] = field(default_factory=dict)
+    # Top-level directories
+    dirs: set[str] = field(default_factory=set)
+    # SHA-256 of top-level files up to FACTS_HASH_MAX_BYTES, by name
+    hashes: dict[str, str] = field(default_factory=dict)
+    # Workflow files in .github/workflows/
+    workflows: list[str] = field(default_factory=list)
+
+    @classmethod
+    def scan(cls, project_path: Path) -> "ProjectFacts":
+        facts = cls()
+        with os.scandir(project_path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    facts.dirs.add(entry.name)
+                elif entry.is_file():
+                    size = entry.stat().st_size
+                    facts.files[entry.name] = size
+                    if size <= FACTS_HASH_MAX_BYTES:
+                        with open(entry.path, "rb") as f:
+                            facts.hashes[entry.name] = hashlib.sha256(f.read()).hexdigest()
+
+        workflows_dir = project_path / ".github" / "workflows"
+        if ".github" in facts.dirs and workflows_dir.is_dir():
+            with os.scandir(workflows_dir) as entries:
+                facts.workflows = [entry.name for entry in entries]
+        return facts
+
+    def has(self, name: str) -> bool:
+        """Whether the project has a top-level file or directory name"""
+        return name in self.files or name in self.dirs
+
+    @property
+    def project_type(self) -> str:
+        """ "python", "typescript", "hybrid" or "unknown", from pyproject.toml and package.json"""
+        has_pyproject = "pyproject.toml" in self.files
+        has_package_json = "package.json" in self.files
+        if has_pyproject and has_package_json:
+            return "hybrid"
+        if has_pyproject:
+            return "python"
+        if has_package_json:
+            return "typescript"
+        return "unknown"
+
+
+@dataclass
+class PreparedProject:
+    """
+    A generated project after its project-local integration steps.
+
+    Holds what still has to be merged into shared monorepo files. Batch mode prepares projects in
+    worker processes and merges them one at a time, so this must stay picklable.
+    """
+
+    project_path: Path
+    project_type: str
+    # Prefixed .gitattributes lines for the monorepo .gitattributes
+    gitattributes: list[str] = field(default_factory=list)
+    # Pre-commit repos (hooks already scoped to the project), None if the project had no config
+    precommit_repos: Optional[list[dict[str, Any]]] = None
+    # Workflows for the monorepo .github/workflows/, by file name
+    workflows: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class IntegrationContext:
+    """What integration steps work on: the project, the monorepo and the results collected so far"""
+
+    project_path: Path
+    monorepo_root: Path
+    prepared: PreparedProject
+    # Integration settings (steps and their options)
+    plan: "IntegrationPlan"
+    # The project as generated (prepare steps only: they assert it's set)
+    facts: Optional[ProjectFacts] = None
+    # Shared monorepo files (merge steps only: they assert they're set)
+    files: Optional[MonorepoFiles] = None
+    # What the steps wrote, by destination (a step output path, e.g. "monorepo:.gitattributes"):
+    # content hash, and whether the destination is shared with other projects (the hash is then
+    # of this project's part only)
+    artifacts: dict[str, dict[str, Any]] = field(default_factory=dict)
+    # Where the steps print to (None: sys.stdout). Steps running concurrently each get their own.
+    output: Optional[TextIO] = None
+
+    @property
+    def project_rel_path(self) -> Path:
+        return self.project_path.relative_to(self.monorepo_root)
+
+    def print(self, *values: Any) -> None:
+        """print() to the step's output"""
+        print(*values, file=self.output)
+
+    def record(self, destination: str, content: str, shared: bool = False) -> None:
+        """Record an artifact written by a step, for the integration manifest"""
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        self.artifacts[destination] = {"hash": digest, "shared": shared}
+
+    def resolve(self, path: str) -> Path:
+        """File system path of a project-relative or "monorepo:" step path"""
+        if path.startswith("monorepo:"):
+            return self.monorepo_root / path.split(":", 1)[1]
+        return self.project_path / path
+
+
+@dataclass
+class IntegrationStep:
+    """
+    One step of integrate_project.
+
+    inputs and outputs declare what the step reads and writes: paths relative to the project
+    (a trailing "/" covers a directory), "monorepo:<path>" for files in the monorepo root and
+    "prepared:<field>" for PreparedProject fields. Steps whose inputs and outputs don't overlap
+    run concurrently. "prepare" steps only touch the project directory (batch mode runs them in
+    worker processes); "merge" steps edit shared monorepo files and run after all prepare steps.
+    """
+
+    name: str
+    phase: str
+    run: Callable[[IntegrationContext], None]
+    inputs: tuple[str, ...] = ()
+    outputs: tuple[str, ...] = ()
+
+
+def remove_git_directory(context: IntegrationContext) -> None:
+    """Remove the project's git repository (the monorepo is the only git repo)"""
+    project_path = context.project_path
+    facts = context.facts
+    assert facts is not None
+
+    if facts.has(".git"):
+        git_dir = project_path / ".git"
+        if git_dir.is_dir():
+            shutil.rmtree(git_dir)
+        else:
+            # Worktree or submodule checkout: .git is a file pointing at the repository
+            git_dir.unlink()
+        context.print("  Removed .git directory (using monorepo's git)")
+
+    # Keep .gitignore - project-specific ignores are useful!
+    if facts.has(".gitignore"):
+        context.print("  Kept .gitignore (project-specific ignores)")
+
+
+def report_project_docs(context: IntegrationContext) -> None:
+    """Keep project documentation files (README.md, docs/, CONTRIBUTING.md, etc.)"""
+    facts = context.facts
+    assert facts is not None
+
+    doc_files = ["README.md", "CONTRIBUTING.md", "CHANGELOG.md", "CODE_OF_CONDUCT.md"]
+    kept_docs = [doc_file for doc_file in doc_files if facts.has(doc_file)]
+
+    if "docs" in facts.dirs:
+        kept_docs.append("docs/")
+
+    if kept_docs:
+        context.print(f"  Kept project documentation: {', '.join(kept_docs)}")
+
+
+def check_license(context: IntegrationContext) -> None:
+    """Keep the project's LICENSE, warning if it differs from the monorepo's"""
+    assert context.facts is not None
+    project_path = context.project_path
+    monorepo_root = context.monorepo_root
+
+    license_path = project_path / "LICENSE"
+    monorepo_license = monorepo_root / "LICENSE"
+
+    if context.facts.has("LICENSE"):
+        context.print("  Kept LICENSE file")
+
+        # Warn if license differs from monorepo
         if monorepo_license.exists():
             try:
                 project_license_content = license_path.read_text().strip()
@@ -412,16 +1915,24 @@ def integrate_project(project_path: Path, monorepo_root: Path) -> None:
                 # Simple comparison - just check if they're different
                 # (not perfect but catches most cases)
                 if project_license_content != monorepo_license_content:
-                    print("  ⚠️  WARNING: Project LICENSE differs from monorepo LICENSE")
-                    print(f"      Please review {project_path.relative_to(monorepo_root)}/LICENSE for compatibility")
+                    context.print("  ⚠️  WARNING: Project LICENSE differs from monorepo LICENSE")
+                    context.print(
+                        f"      Please review {project_path.relative_to(monorepo_root)}/LICENSE for compatibility"
+                    )
             except Exception:
                 # If we can't read/compare, just warn generically
-                print("  ⚠️  WARNING: Please verify LICENSE compatibility")
+                context.print("  ⚠️  WARNING: Please verify LICENSE compatibility")
+
+
+def collect_gitattributes(context: IntegrationContext) -> None:
+    """Collect the project's .gitattributes for the monorepo (with path prefixes)"""
+    assert context.facts is not None
+    project_path = context.project_path
+    monorepo_root = context.monorepo_root
+    prepared = context.prepared
 
-    # 4. Merge .gitattributes to monorepo level
     gitattributes_path = project_path / ".gitattributes"
-    if gitattributes_path.exists():
-        monorepo_gitattributes = monorepo_root / ".gitattributes"
+    if context.facts.has(".gitattributes"):
         project_rel_path = project_path.relative_to(monorepo_root)
 
         # Read project's .gitattributes
@@ -447,46 +1958,28 @@ def integrate_project(project_path: Path, monorepo_root: Path) -> None:
                     # Keep comments
                     prefixed_attrs.append(line)
 
-            if prefixed_attrs:
-                # Read existing monorepo .gitattributes
-                existing_content = ""
-                if monorepo_gitattributes.exists():
-                    existing_content = monorepo_gitattributes.read_text().strip()
-
-                # Append project attributes with a header
-                new_section = f"\n# Attributes from {project_path.name}\n" + "\n".join(prefixed_attrs)
+            prepared.gitattributes = prefixed_attrs
 
-                # Write updated .gitattributes
-                with open(monorepo_gitattributes, "a") as f:
-                    if existing_content:
-                        f.write("\n")
-                    f.write(new_section)
-                    f.write("\n")
+        # Remove project's .gitattributes (merged into the monorepo's)
+        gitattributes_path.unlink()
 
-                print(f"  Merged .gitattributes to monorepo (scoped to {project_rel_path}/)")
 
-        # Remove project's .gitattributes after merging
-        gitattributes_path.unlink()
+def collect_precommit_hooks(context: IntegrationContext) -> None:
+    """Collect the project's pre-commit hooks for the monorepo (scoped with file patterns)"""
+    assert context.facts is not None
+    project_path = context.project_path
+    monorepo_root = context.monorepo_root
+    prepared = context.prepared
 
-    # 5. Migrate pre-commit hooks to monorepo level
     precommit_file = project_path / ".pre-commit-config.yaml"
-    if precommit_file.exists():
-        monorepo_precommit = monorepo_root / ".pre-commit-config.yaml"
+    if context.facts.has(".pre-commit-config.yaml"):
         project_rel_path = project_path.relative_to(monorepo_root)
 
         # Read project's pre-commit config
-        import yaml
-
         with open(precommit_file) as f:
             project_hooks = yaml.safe_load(f)
 
-        if monorepo_precommit.exists():
-            with open(monorepo_precommit) as f:
-                monorepo_hooks = yaml.safe_load(f)
-        else:
-            monorepo_hooks = {"repos": []}
-
-        # Merge hooks with file patterns
+        # Scope hooks with file patterns
         if project_hooks and "repos" in project_hooks:
             for repo in project_hooks["repos"]:
                 # Add file pattern to restrict hooks to this project
@@ -494,50 +1987,39 @@ def integrate_project(project_path: Path, monorepo_root: Path) -> None:
                     for hook in repo["hooks"]:
                         if "files" not in hook:
                             hook["files"] = f"^{project_rel_path}/"
+            prepared.precommit_repos = project_hooks["repos"]
 
-                # Check if repo already exists in monorepo config
-                existing_repo = next((r for r in monorepo_hooks["repos"] if r.get("repo") == repo.get("repo")), None)
-
-                if existing_repo:
-                    # Merge hooks from this repo
-                    existing_hooks = {h["id"]: h for h in existing_repo.get("hooks", [])}
-                    for hook in repo.get("hooks", []):
-                        if hook["id"] not in existing_hooks:
-                            existing_repo.setdefault("hooks", []).append(hook)
-                else:
-                    # Add new repo
-                    monorepo_hooks["repos"].append(repo)
+        # Remove project's pre-commit config (merged into the monorepo's)
+        precommit_file.unlink()
 
-            # Write updated monorepo pre-commit config
-            with open(monorepo_precommit, "w") as f:
-                yaml.dump(monorepo_hooks, f, default_flow_style=False, sort_keys=False)
 
-            print(f"  Merged pre-commit hooks to monorepo config (scoped to {project_rel_path}/)")
+def collect_workflows(context: IntegrationContext) -> None:
+    """Collect the project's GitHub workflows for the monorepo (with path filters)"""
+    project_path = context.project_path
+    monorepo_root = context.monorepo_root
+    prepared = context.prepared
 
-        # Remove project's pre-commit config after merging
-        precommit_file.unlink()
+    facts = context.facts
+    assert facts is not None
 
-    # 6. Migrate GitHub workflows to monorepo level
     github_dir = project_path / ".github"
-    if github_dir.exists():
+    if facts.has(".github"):
         workflows_dir = github_dir / "workflows"
-        monorepo_workflows = monorepo_root / ".github" / "workflows"
 
-        if workflows_dir.exists() and any(workflows_dir.iterdir()):
-            monorepo_workflows.mkdir(parents=True, exist_ok=True)
+        if facts.workflows:
             project_rel_path = project_path.relative_to(monorepo_root)
 
-            # Move workflows with path filters
-            migrated_count = 0
-            for workflow_file in workflows_dir.glob("*.y*ml"):
+            # Collect workflows with path filters
+            for workflow_name in facts.workflows:
+                if not (workflow_name.endswith(".yml") or workflow_name.endswith(".yaml")):
+                    continue
+                workflow_file = workflows_dir / workflow_name
                 # Read workflow
                 content = workflow_file.read_text()
 
                 # Add path filter if not present
                 if "paths:" not in content and "on:" in content:
                     # Add path filter after the 'on:' trigger
-                    import re
-
                     # Find the trigger section and add paths
                     content = re.sub(
                         r"(on:\s*\n\s*(?:push|pull_request):)",
@@ -545,23 +2027,22 @@ def integrate_project(project_path: Path, monorepo_root: Path) -> None:
                         content,
                     )
 
-                # Write to monorepo workflows with project prefix
+                # Monorepo workflow name with project prefix
                 new_name = f"{project_path.name}-{workflow_file.name}"
-                new_path = monorepo_workflows / new_name
-                new_path.write_text(content)
-                migrated_count += 1
-
-            if migrated_count > 0:
-                print(f"  Migrated {migrated_count} workflow(s) to monorepo .github/workflows/ (with path filters)")
+                prepared.workflows[new_name] = content
 
         # Remove project's .github directory
         shutil.rmtree(github_dir)
 
-    # 7. Fix git-based versioning for monorepo
-    pyproject_file = project_path / "pyproject.toml"
-    if pyproject_file.exists():
-        import re
 
+def fix_git_versioning(context: IntegrationContext) -> None:
+    """Point git-based versioning (hatch-vcs, setuptools-scm) at the monorepo's git"""
+    assert context.facts is not None
+    project_path = context.project_path
+    monorepo_root = context.monorepo_root
+
+    pyproject_file = project_path / "pyproject.toml"
+    if context.facts.has("pyproject.toml"):
         content = pyproject_file.read_text()
 
         # Check for git-based versioning tools
@@ -570,20 +2051,16 @@ def integrate_project(project_path: Path, monorepo_root: Path) -> None:
             if "[tool.hatch.version]" in content:
                 if "root" not in content:
                     # Find the monorepo root relative to the project
-                    import os
-
                     rel_path = os.path.relpath(monorepo_root, project_path)
                     content = content.replace("[tool.hatch.version]", f'[tool.hatch.version]\nroot = "{rel_path}"')
                     pyproject_file.write_text(content)
-                    print("  Configured hatch-vcs to use monorepo's git")
+                    context.print("  Configured hatch-vcs to use monorepo's git")
             else:
                 # Add the configuration section
-                import os
-
                 rel_path = os.path.relpath(monorepo_root, project_path)
                 content += f'\n[tool.hatch.version]\nsource = "vcs"\nroot = "{rel_path}"\n'
                 pyproject_file.write_text(content)
-                print("  Added hatch-vcs configuration for monorepo")
+                context.print("  Added hatch-vcs configuration for monorepo")
 
         elif "setuptools-scm" in content or "setuptools_scm" in content:
             # setuptools-scm: Add search_parent_directories = true
@@ -594,30 +2071,36 @@ def integrate_project(project_path: Path, monorepo_root: Path) -> None:
                         "[tool.setuptools_scm]\nsearch_parent_directories = true",
                     )
                     pyproject_file.write_text(content)
-                    print("  Configured setuptools-scm to search parent directories")
+                    context.print("  Configured setuptools-scm to search parent directories")
             else:
                 content += "\n[tool.setuptools_scm]\nsearch_parent_directories = true\n"
                 pyproject_file.write_text(content)
-                print("  Added setuptools-scm configuration for monorepo")
-
-    # 8. Detect project type
-    has_pyproject = (project_path / "pyproject.toml").exists()
-    has_package_json = (project_path / "package.json").exists()
-
-    if has_pyproject and has_package_json:
-        print("  Detected: Hybrid project (Python + TypeScript)")
-        project_type = "hybrid"
-    elif has_pyproject:
-        print("  Detected: Python project")
-        project_type = "python"
-    elif has_package_json:
-        print("  Detected: TypeScript project")
-        project_type = "typescript"
+                context.print("  Added setuptools-scm configuration for monorepo")
+
+
+def detect_project_type(context: IntegrationContext) -> None:
+    """Detect the project type (Python, TypeScript or hybrid)"""
+    assert context.facts is not None
+    project_type = context.facts.project_type
+
+    if project_type == "hybrid":
+        context.print("  Detected: Hybrid project (Python + TypeScript)")
+    elif project_type == "python":
+        context.print("  Detected: Python project")
+    elif project_type == "typescript":
+        context.print("  Detected: TypeScript project")
     else:
-        print("  Warning: Unknown project type (no pyproject.toml or package.json)")
-        project_type = "unknown"
+        context.print("  Warning: Unknown project type (no pyproject.toml or package.json)")
+
+    context.prepared.project_type = project_type
+
+
+def remove_duplicate_configs(context: IntegrationContext) -> None:
+    """Remove configs that duplicate the monorepo's shared ones (Python projects)"""
+    assert context.facts is not None
+    project_path = context.project_path
+    project_type = context.prepared.project_type
 
-    # 9. Remove duplicate configuration files for Python projects
     if project_type in ["python", "hybrid"]:
         duplicate_configs = [
             "ruff.toml",
@@ -627,24 +2110,138 @@ def integrate_project(project_path: Path, monorepo_root: Path) -> None:
         ]
 
         for config_file in duplicate_configs:
-            config_path = project_path / config_file
-            if config_path.exists():
-                print(f"  Removing duplicate config: {config_file}")
-                config_path.unlink()
+            if config_file in context.facts.files:
+                context.print(f"  Removing duplicate config: {config_file}")
+                (project_path / config_file).unlink()
+
+
+def merge_gitattributes(context: IntegrationContext) -> None:
+    """Merge the collected .gitattributes into the monorepo's (or the project's own, per-directory)"""
+    project_path = context.project_path
+    project_rel_path = context.project_rel_path
+    prepared = context.prepared
+    files = context.files
+    assert files is not None
+
+    if prepared.gitattributes:
+        # Keyed by path: projects with the same name in different target dirs get their own sections
+        name = project_rel_path.as_posix()
+        prefix = f"{name}/"
+
+        # Sections used to be keyed by the project's basename: drop this project's old section (only
+        # if all its patterns are inside the project, so another project's section is never touched)
+        legacy = files.gitattributes.sections.get(project_path.name) or {}
+        patterns = [pattern for pattern, attrs in legacy.items() if attrs is not None]
+        if project_path.name != name and patterns and all(pattern.startswith(prefix) for pattern in patterns):
+            files.gitattributes.remove_section(project_path.name)
+            files.mark_changed(".gitattributes")
+
+        if context.plan.gitattributes == "per-directory":
+            # Patterns relative to the project, in the project's own .gitattributes
+            attributes = GitAttributes()
+            attributes.set_section(
+                name, [line[len(prefix) :] if line.startswith(prefix) else line for line in prepared.gitattributes]
+            )
+            content = "\n".join(attributes.section_lines(name)) + "\n"
+            (project_path / ".gitattributes").write_text(content)
+            context.record(".gitattributes", content)
+
+            # Moved out of the root .gitattributes (written by files.flush())
+            if files.gitattributes.remove_section(name):
+                files.mark_changed(".gitattributes")
+
+            context.print(f"  Wrote {project_rel_path}/.gitattributes")
+            return
+
+        # Add or replace the project's section (written by files.flush())
+        if files.gitattributes.set_section(name, prepared.gitattributes):
+            files.mark_changed(".gitattributes")
+        section = "\n".join(files.gitattributes.section_lines(name))
+        context.record("monorepo:.gitattributes", section, shared=True)
+
+        context.print(f"  Merged .gitattributes to monorepo (scoped to {project_rel_path}/)")
+
+
+def merge_precommit_hooks(context: IntegrationContext) -> None:
+    """
+    Merge the collected pre-commit hooks into the monorepo config.
+
+    Identical hooks (same repo, rev, id and settings other than files) brought by several projects
+    become one entry whose files regex matches all their directories, so pre-commit runs each tool
+    once per commit. The project's earlier hooks are replaced, so merging again is idempotent.
+    """
+    project_rel_path = context.project_rel_path
+    prepared = context.prepared
+    files = context.files
+    assert files is not None
+
+    if prepared.precommit_repos is not None:
+        changed, shared = files.precommit_config.merge_project(project_rel_path.as_posix(), prepared.precommit_repos)
+
+        # Updated monorepo pre-commit config is written by files.flush()
+        if changed:
+            files.mark_changed(".pre-commit-config.yaml")
+        context.record(
+            "monorepo:.pre-commit-config.yaml", json.dumps(prepared.precommit_repos, default=str), shared=True
+        )
+
+        shared_note = f", {shared} hook(s) shared with other projects" if shared else ""
+        context.print(f"  Merged pre-commit hooks to monorepo config (scoped to {project_rel_path}/{shared_note})")
+
+
+def write_workflows(context: IntegrationContext) -> None:
+    """
+    Write the collected workflows to the monorepo .github/workflows/, or add their jobs to the
+    generated matrix workflow (see WorkflowMatrix)
+    """
+    monorepo_root = context.monorepo_root
+    prepared = context.prepared
+    files = context.files
+    assert files is not None
+    project = context.project_rel_path.as_posix()
+
+    if context.plan.workflows == "matrix":
+        # Updated matrix workflow is written by files.flush()
+        if files.workflow_matrix.add_project(project, prepared.workflows):
+            files.mark_changed(WORKFLOW_MATRIX_FILE)
+        if prepared.workflows:
+            context.record(f"monorepo:{WORKFLOW_MATRIX_FILE}", json.dumps(prepared.workflows), shared=True)
+            context.print(f"  Added the jobs of {len(prepared.workflows)} workflow(s) to {WORKFLOW_MATRIX_FILE}")
+        return
+
+    # Copied workflows replace the project's jobs in the matrix workflow (after switching modes)
+    if files.workflow_matrix.remove_project(project):
+        files.mark_changed(WORKFLOW_MATRIX_FILE)
+
+    if prepared.workflows:
+        monorepo_workflows = monorepo_root / ".github" / "workflows"
+        monorepo_workflows.mkdir(parents=True, exist_ok=True)
+
+        # Write to monorepo workflows with project prefix
+        for new_name, content in prepared.workflows.items():
+            (monorepo_workflows / new_name).write_text(content)
+            context.record(f"monorepo:.github/workflows/{new_name}", content)
+
+        context.print(
+            f"  Migrated {len(prepared.workflows)} workflow(s) to monorepo .github/workflows/ (with path filters)"
+        )
+
+
+def add_to_workspace(context: IntegrationContext) -> None:
+    """Add the project to its workspace (uv for Python, npm/pnpm for TypeScript)"""
+    project_path = context.project_path
+    monorepo_root = context.monorepo_root
+    project_type = context.prepared.project_type
+    files = context.files
+    assert files is not None
 
-    # 10. Add to workspace
     if project_type in ["python", "hybrid"]:
-        print("  Python project will be auto-discovered by uv workspace (glob patterns in pyproject.toml)")
+        context.print("  Python project will be auto-discovered by uv workspace (glob patterns in pyproject.toml)")
 
     if project_type in ["typescript", "hybrid"]:
         # Add to npm/pnpm workspace
-        import json
-
-        package_json_path = monorepo_root / "package.json"
-        if package_json_path.exists():
-            with open(package_json_path) as f:
-                package_data = json.load(f)
-
+        package_data = files.package_json
+        if package_data is not None:
             # Get relative path from monorepo root
             relative_path = project_path.relative_to(monorepo_root)
 
@@ -653,55 +2250,1325 @@ def integrate_project(project_path: Path, monorepo_root: Path) -> None:
                 package_data["workspaces"] = []
 
             workspace_path = str(relative_path)
+            context.record("monorepo:package.json", workspace_path, shared=True)
             if workspace_path not in package_data["workspaces"]:
                 package_data["workspaces"].append(workspace_path)
-                print(f"  Added to npm/pnpm workspace: {workspace_path}")
+                context.print(f"  Added to npm/pnpm workspace: {workspace_path}")
+
+                # Updated package.json is written by files.flush()
+                files.mark_changed("package.json")
 
-                # Write updated package.json
-                with open(package_json_path, "w") as f:
-                    json.dump(package_data, f, indent=2)
-                    f.write("\n")  # Add trailing newline
 
-    # 11. Generate WebStorm run configurations for TypeScript projects
+def add_run_configurations(context: IntegrationContext) -> None:
+    """Generate WebStorm run configurations for TypeScript projects"""
+    project_path = context.project_path
+    monorepo_root = context.monorepo_root
+    project_type = context.prepared.project_type
+
     if project_type in ["typescript", "hybrid"]:
-        generate_webstorm_run_configs(project_path, monorepo_root)
+        for file_name, content in generate_webstorm_run_configs(project_path, monorepo_root, context.output).items():
+            context.record(f"monorepo:.run/{file_name}", content)
+
+
+# Integration steps in their default order (enable, disable or reorder them with the "integration"
+# section of project-templates.yaml)
+INTEGRATION_STEPS: dict[str, IntegrationStep] = {
+    step.name: step
+    for step in (
+        IntegrationStep("remove-git", "prepare", remove_git_directory, inputs=(".git/",), outputs=(".git/",)),
+        IntegrationStep("keep-docs", "prepare", report_project_docs, inputs=("README.md", "docs/")),
+        IntegrationStep("check-license", "prepare", check_license, inputs=("LICENSE", "monorepo:LICENSE")),
+        IntegrationStep(
+            "collect-gitattributes",
+            "prepare",
+            collect_gitattributes,
+            inputs=(".gitattributes",),
+            outputs=(".gitattributes", "prepared:gitattributes"),
+        ),
+        IntegrationStep(
+            "collect-pre-commit",
+            "prepare",
+            collect_precommit_hooks,
+            inputs=(".pre-commit-config.yaml",),
+            outputs=(".pre-commit-config.yaml", "prepared:precommit_repos"),
+        ),
+        IntegrationStep(
+            "collect-workflows",
+            "prepare",
+            collect_workflows,
+            inputs=(".github/",),
+            outputs=(".github/", "prepared:workflows"),
+        ),
+        IntegrationStep(
+            "fix-versioning", "prepare", fix_git_versioning, inputs=("pyproject.toml",), outputs=("pyproject.toml",)
+        ),
+        IntegrationStep(
+            "detect-type",
+            "prepare",
+            detect_project_type,
+            inputs=("pyproject.toml", "package.json"),
+            outputs=("prepared:project_type",),
+        ),
+        IntegrationStep(
+            "remove-duplicate-configs",
+            "prepare",
+            remove_duplicate_configs,
+            inputs=("prepared:project_type",),
+            outputs=("ruff.toml", ".ruff.toml", "pyrightconfig.json", ".pyrightconfig.json"),
+        ),
+        IntegrationStep(
+            "merge-gitattributes",
+            "merge",
+            merge_gitattributes,
+            inputs=("prepared:gitattributes", "plan:gitattributes"),
+            outputs=("monorepo:.gitattributes", ".gitattributes"),
+        ),
+        IntegrationStep(
+            "merge-pre-commit",
+            "merge",
+            merge_precommit_hooks,
+            inputs=("prepared:precommit_repos",),
+            outputs=("monorepo:.pre-commit-config.yaml",),
+        ),
+        IntegrationStep(
+            "write-workflows",
+            "merge",
+            write_workflows,
+            inputs=("prepared:workflows", "plan:workflows"),
+            outputs=("monorepo:.github/workflows/", f"monorepo:{WORKFLOW_MATRIX_STATE}"),
+        ),
+        IntegrationStep(
+            "add-to-workspace",
+            "merge",
+            add_to_workspace,
+            inputs=("prepared:project_type",),
+            outputs=("monorepo:package.json",),
+        ),
+        IntegrationStep(
+            "run-configurations",
+            "merge",
+            add_run_configurations,
+            inputs=("prepared:project_type", "package.json"),
+            outputs=("monorepo:.run/",),
+        ),
+    )
+}
+
+# Integration steps running at the same time (1 runs them one after another)
+DEFAULT_INTEGRATION_JOBS = 4
+
+# Where project .gitattributes go: a section of the root .gitattributes with prefixed patterns, or
+# the project's own .gitattributes (git applies it to the project directory only, so lookups
+# outside the project don't evaluate its lines)
+GITATTRIBUTES_MODES = ("root", "per-directory")
+
+# How project workflows are migrated: copied to .github/workflows/<project>-<file> with a paths
+# filter, or merged into one generated workflow whose matrix jobs run only for affected projects
+WORKFLOW_MODES = ("copy", "matrix")
+
+
+@dataclass
+class IntegrationPlan:
+    """Which integration steps run, in which order, how many may run at once, and their options"""
+
+    steps: list[str] = field(default_factory=lambda: list(INTEGRATION_STEPS))
+    jobs: int = DEFAULT_INTEGRATION_JOBS
+    # Where merge-gitattributes puts project attributes (see GITATTRIBUTES_MODES)
+    gitattributes: str = "root"
+    # How write-workflows migrates project workflows (see WORKFLOW_MODES)
+    workflows: str = "copy"
+
+    @classmethod
+    def from_config(cls, monorepo_root: Path, template_config: Optional[dict[str, Any]] = None) -> "IntegrationPlan":
+        """
+        Build the plan from the "integration" section of project-templates.yaml:
+
+            integration:
+              steps: [remove-git, collect-workflows, ...]  # Order (and subset) of steps to run
+              disable: [run-configurations]               # Steps to skip
+              jobs: 4                                     # Independent steps run concurrently
+              gitattributes: root                         # Or per-directory (see GITATTRIBUTES_MODES)
+              workflows: copy                             # Or matrix (see WORKFLOW_MODES)
+
+        A template's own "integration" section overrides the top-level one key by key.
+        """
+        settings = dict(load_monorepo_config(monorepo_root).get("integration") or {})
+        settings.update((template_config or {}).get("integration") or {})
+
+        steps = list(settings.get("steps") or INTEGRATION_STEPS)
+        disabled = list(settings.get("disable") or [])
+        unknown = [name for name in steps + disabled if name not in INTEGRATION_STEPS]
+        if unknown:
+            print(f"Error: Unknown integration step(s): {', '.join(unknown)}")
+            print(f"Available steps: {', '.join(INTEGRATION_STEPS)}")
+            sys.exit(1)
+
+        modes = {}
+        for option, choices in (("gitattributes", GITATTRIBUTES_MODES), ("workflows", WORKFLOW_MODES)):
+            modes[option] = settings.get(option, choices[0])
+            if modes[option] not in choices:
+                print(f"Error: Unknown integration {option} mode: {modes[option]}")
+                print(f"Available modes: {', '.join(choices)}")
+                sys.exit(1)
+
+        jobs = int(settings.get("jobs", DEFAULT_INTEGRATION_JOBS))
+        return cls([name for name in steps if name not in disabled], max(jobs, 1), **modes)
+
+    def phase(self, phase: str) -> list[IntegrationStep]:
+        """Steps of one phase ("prepare" or "merge"), in plan order"""
+        return [INTEGRATION_STEPS[name] for name in self.steps if INTEGRATION_STEPS[name].phase == phase]
+
+
+def paths_overlap(paths: tuple[str, ...], other_paths: tuple[str, ...]) -> bool:
+    """Whether any step input/output path equals, contains or is contained in one of other_paths"""
+    return any(
+        path == other
+        or (path.endswith("/") and other.startswith(path))
+        or (other.endswith("/") and path.startswith(other))
+        for path in paths
+        for other in other_paths
+    )
+
+
+def step_dependencies(steps: list[IntegrationStep]) -> dict[str, list[str]]:
+    """
+    For each step, the earlier steps it has to wait for: those that write something it reads or
+    writes, or read something it writes.
+    """
+    dependencies = {}
+    for index, step in enumerate(steps):
+        dependencies[step.name] = [
+            earlier.name
+            for earlier in steps[:index]
+            if paths_overlap(earlier.outputs, step.inputs + step.outputs) or paths_overlap(earlier.inputs, step.outputs)
+        ]
+    return dependencies
+
+
+def run_integration_steps(steps: list[IntegrationStep], context: IntegrationContext, jobs: int) -> None:
+    """
+    Run integration steps in order, running independent ones (see step_dependencies) concurrently
+    on up to jobs threads.
+
+    Each step's output is printed in step order once all steps have finished. A failing step fails
+    the steps that depend on it; the first error in step order is raised.
+    """
+    if jobs <= 1 or len(steps) <= 1:
+        for step in steps:
+            with TRACER.span(step.name, category="integrate", project=context.project_path.name):
+                step.run(context)
+        return
+
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+    dependencies = step_dependencies(steps)
+    buffers = {step.name: io.StringIO() for step in steps}
+    futures: dict[str, Future] = {}
+
+    def run(step: IntegrationStep, waits_for: list[Future]) -> None:
+        for future in waits_for:
+            # Re-raises the error of a failed dependency
+            future.result()
+        # Same context (shared prepared project and artifacts), printing to the step's buffer
+        with TRACER.span(step.name, category="integrate", project=context.project_path.name):
+            step.run(replace(context, output=buffers[step.name]))
+
+    # Dependencies are always submitted before the steps waiting for them, so a waiting step never
+    # holds the only worker thread its dependency could run on
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for step in steps:
+                waits_for = [futures[name] for name in dependencies[step.name]]
+                futures[step.name] = executor.submit(run, step, waits_for)
+    finally:
+        for step in steps:
+            print(buffers[step.name].getvalue(), end="", file=context.output)
+
+    for step in steps:
+        futures[step.name].result()
+
+
+def integrate_project(
+    project_path: Path,
+    monorepo_root: Path,
+    files: Optional[MonorepoFiles] = None,
+    sync: Optional[str] = "scoped",
+    plan: Optional[IntegrationPlan] = None,
+    origin: Optional[dict[str, Any]] = None,
+) -> str:
+    """
+    Integrate the generated project with monorepo conventions.
+
+    This function demonstrates the integration pattern. Customize based on your needs.
+
+    Integration runs the steps registered in INTEGRATION_STEPS, as configured by the "integration"
+    section of project-templates.yaml (see IntegrationPlan). By default:
+
+    Project-local steps (prepare_project_integration):
+    1. remove-git: Remove git repository (monorepo is the only git repo)
+    2. keep-docs: Keep project documentation (README.md, docs/, CONTRIBUTING.md, etc.)
+    3. check-license: Handle LICENSE files (keep and warn if different from monorepo)
+    4. collect-gitattributes: Collect .gitattributes for the monorepo config (with path prefixes)
+    5. collect-pre-commit: Collect pre-commit hooks for the monorepo config (with file patterns)
+    6. collect-workflows: Collect GitHub workflows for the monorepo (with path filters)
+    7. fix-versioning: Fix git-based versioning (hatch-vcs, setuptools-scm)
+    8. detect-type: Detect project type (Python vs TypeScript)
+    9. remove-duplicate-configs: Remove duplicate configs (use monorepo's shared configs instead)
+
+    Merge steps (merge_project_integration):
+    10. merge-gitattributes, merge-pre-commit, write-workflows: Merge the collected .gitattributes,
+        pre-commit hooks and workflows into the monorepo
+    11. add-to-workspace: Add to appropriate workspace (uv for Python, npm/pnpm for TypeScript)
+    12. run-configurations: Generate WebStorm run configurations
+    13. Update workspace configuration
+
+    Edits to shared monorepo files go through files. When files is passed in (batch mode), the
+    caller flushes it; otherwise the edits are written before returning. sync is the workspace sync
+    mode (see SYNC_MODES); with sync=None the workspaces are not synced (the caller runs
+    sync_workspaces once for all projects). plan defaults to the monorepo's "integration" settings.
+    origin holds the project registry fields describing where the project came from (template,
+    template_sha, created_at).
+
+    Returns the detected project type.
+    """
+    owns_files = files is None
+    if files is None:
+        files = MonorepoFiles(monorepo_root)
+
+    plan = plan or IntegrationPlan.from_config(monorepo_root)
+
+    print(f"\nIntegrating {project_path.name} into monorepo...")
+    prepared = prepare_project_integration(project_path, monorepo_root, plan)
+    merge_project_integration(prepared, monorepo_root, files, plan, origin)
+
+    if owns_files:
+        files.flush()
 
     print("  ✓ Integration complete!")
 
-    # 12. Update workspaces
+    # 13. Update workspaces
+    if sync:
+        sync_workspaces(monorepo_root, {project_path: prepared.project_type}, sync)
+
+    return prepared.project_type
+
+
+def prepare_project_integration(
+    project_path: Path, monorepo_root: Path, plan: Optional[IntegrationPlan] = None
+) -> PreparedProject:
+    """
+    Run the project-local ("prepare") integration steps: only the project directory is modified.
+
+    Shared monorepo files are left alone; what needs to go into them is collected in the returned
+    PreparedProject (see merge_project_integration). Safe to run for several projects concurrently.
+    """
+    plan = plan or IntegrationPlan.from_config(monorepo_root)
+    prepared = PreparedProject(project_path=project_path, project_type="unknown")
+    with TRACER.span("scan project", category="integrate", project=project_path.name):
+        facts = ProjectFacts.scan(project_path)
+    context = IntegrationContext(project_path, monorepo_root, prepared, plan, facts=facts)
+    run_integration_steps(plan.phase("prepare"), context, plan.jobs)
+    return prepared
+
+
+def merge_project_integration(
+    prepared: PreparedProject,
+    monorepo_root: Path,
+    files: MonorepoFiles,
+    plan: Optional[IntegrationPlan] = None,
+    origin: Optional[dict[str, Any]] = None,
+) -> None:
+    """
+    Run the "merge" integration steps, merging a prepared project into the shared monorepo files.
+
+    Edits go through files (written by files.flush()). Must run for one project at a time. Writes
+    the project's integration manifest (see write_integration_manifest) and registers the project
+    with the origin fields (see MonorepoFiles.register_project).
+    """
+    plan = plan or IntegrationPlan.from_config(monorepo_root)
+    context = IntegrationContext(prepared.project_path, monorepo_root, prepared, plan, files=files)
+    run_integration_steps(plan.phase("merge"), context, plan.jobs)
+
+    manifest_hash = write_integration_manifest(context, [INTEGRATION_STEPS[name] for name in plan.steps])
+    files.register_project(
+        prepared.project_path, type=prepared.project_type, integration_manifest=manifest_hash, **(origin or {})
+    )
+
+
+def integration_manifest_path(monorepo_root: Path, project_path: Path) -> Path:
+    """Where the integration manifest of a project is stored (apps/my-app -> apps--my-app.json)"""
+    name = project_path.relative_to(monorepo_root).as_posix().replace("/", "--")
+    return monorepo_root / INTEGRATION_MANIFEST_DIR / f"{name}.json"
+
+
+def file_digest(path: Path) -> Optional[str]:
+    """SHA-256 of a file's content, None if it doesn't exist"""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+    except IsADirectoryError:
+        return "dir"
+
+
+def input_fingerprint(path: str, context: IntegrationContext) -> Optional[str]:
+    """
+    Fingerprint of a step input (see IntegrationStep), None if it doesn't exist.
+
+    Project files come from context.facts, so fingerprinting doesn't stat them again.
+    """
+    if path.startswith("prepared:"):
+        value = getattr(context.prepared, path.split(":", 1)[1])
+        return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+    if path.startswith("plan:"):
+        return str(getattr(context.plan, path.split(":", 1)[1]))
+    if path.startswith("monorepo:"):
+        return file_digest(context.resolve(path))
+
+    facts = context.facts
+    assert facts is not None
+    if path.endswith("/"):
+        return "dir" if path[:-1] in facts.dirs else None
+    if path in facts.files:
+        return facts.hashes.get(path, f"size:{facts.files[path]}")
+    return None
+
+
+def write_integration_manifest(
+    context: IntegrationContext, steps: list[IntegrationStep], artifacts: Optional[list[dict[str, Any]]] = None
+) -> str:
+    """
+    Record how a project was integrated in .monorepo/integrations/<project>.json.
+
+    The manifest holds the fingerprints of every step's inputs, each artifact written (destination,
+    content hash and the step that wrote it) and the collected project data, whose sources are
+    removed from the project. reintegrate compares against it to re-run only what changed.
+    artifacts are entries kept from an earlier manifest; context.artifacts are added to them.
+    Returns the SHA-256 of the manifest.
+    """
+    context.facts = ProjectFacts.scan(context.project_path)
+
+    artifacts = list(artifacts or [])
+    for destination, artifact in context.artifacts.items():
+        # Written by the last step that declares it as an output
+        owner = next((step.name for step in reversed(steps) if paths_overlap((destination,), step.outputs)), None)
+        artifacts.append({"destination": destination, "step": owner, **artifact})
+
+    prepared = context.prepared
+    manifest = {
+        "project": context.project_rel_path.as_posix(),
+        "steps": [step.name for step in steps],
+        "inputs": {step.name: {path: input_fingerprint(path, context) for path in step.inputs} for step in steps},
+        "artifacts": sorted(artifacts, key=lambda artifact: artifact["destination"]),
+        "prepared": {
+            "project_type": prepared.project_type,
+            "gitattributes": prepared.gitattributes,
+            "precommit_repos": prepared.precommit_repos,
+            "workflows": prepared.workflows,
+        },
+    }
+
+    manifest_path = integration_manifest_path(context.monorepo_root, context.project_path)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    content = json.dumps(manifest, indent=2, default=str) + "\n"
+    manifest_path.write_text(content)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def reintegrate_project(
+    manifest: dict[str, Any], monorepo_root: Path, files: MonorepoFiles, plan: IntegrationPlan
+) -> list[str]:
+    """
+    Re-run the integration steps of a project whose inputs changed since its manifest was written,
+    or whose own output files were modified or deleted. Returns the names of the steps that ran.
+
+    The steps are those the project was integrated with; their options come from plan (built for the
+    project's template). The project's registry entry is updated with the new manifest.
+
+    Artifacts that a re-run step no longer produces (e.g. a run configuration for a removed npm
+    script) are deleted. Shared files are only edited by steps that re-run.
+    """
+    project_path = monorepo_root / manifest["project"]
+    saved = manifest["prepared"]
+    prepared = PreparedProject(
+        project_path=project_path,
+        project_type=saved["project_type"],
+        gitattributes=saved["gitattributes"],
+        precommit_repos=saved["precommit_repos"],
+        workflows=saved["workflows"],
+    )
+    facts = ProjectFacts.scan(project_path)
+    context = IntegrationContext(project_path, monorepo_root, prepared, plan, facts, files)
+    steps = [INTEGRATION_STEPS[name] for name in manifest["steps"] if name in INTEGRATION_STEPS]
+
+    def drifted(step: IntegrationStep) -> bool:
+        return any(
+            file_digest(context.resolve(artifact["destination"])) != artifact["hash"]
+            for artifact in manifest["artifacts"]
+            if artifact["step"] == step.name and not artifact["shared"]
+        )
+
+    rerun = []
+    for step in steps:
+        # Inputs written by a step that just re-ran ("prepared:" fields) are fingerprinted afresh
+        current = {path: input_fingerprint(path, context) for path in step.inputs}
+        if manifest["inputs"].get(step.name) == current and not drifted(step):
+            continue
+        if not rerun:
+            print(f"\nReintegrating {manifest['project']}...")
+        run_integration_steps([step], context, jobs=1)
+        rerun.append(step.name)
+
+    if not rerun:
+        return rerun
+
+    kept = [artifact for artifact in manifest["artifacts"] if artifact["step"] not in rerun]
+    for artifact in manifest["artifacts"]:
+        destination = artifact["destination"]
+        if artifact["step"] in rerun and not artifact["shared"] and destination not in context.artifacts:
+            stale_path = context.resolve(destination)
+            if stale_path.is_file():
+                stale_path.unlink()
+                print(f"  Removed {stale_path.relative_to(monorepo_root)} (no longer produced)")
+
+    manifest_hash = write_integration_manifest(context, steps, kept)
+    files.register_project(project_path, type=prepared.project_type, integration_manifest=manifest_hash)
+    return rerun
+
+
+def reintegrate_command(monorepo_root: Path, args: list[str]) -> None:
+    """Re-apply integration where its inputs changed: `reintegrate [project ...] [--sync MODE]`"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="add-project.py reintegrate",
+        description="Re-run integration steps whose inputs changed since the project was integrated",
+    )
+    parser.add_argument(
+        "projects", nargs="*", help="Project paths (apps/my-app) or names (default: all integrated projects)"
+    )
+    parser.add_argument(
+        "--sync",
+        choices=SYNC_MODES,
+        default="scoped",
+        help="How to sync projects re-added to a workspace: scoped (default) or full",
+    )
+    options = parser.parse_args(args)
+
+    manifest_dir = monorepo_root / INTEGRATION_MANIFEST_DIR
+    manifests = []
+    for manifest_path in sorted(manifest_dir.glob("*.json")) if manifest_dir.is_dir() else []:
+        with open(manifest_path) as f:
+            manifests.append(json.load(f))
+
+    if options.projects:
+        selected = [
+            manifest
+            for manifest in manifests
+            if manifest["project"] in options.projects or Path(manifest["project"]).name in options.projects
+        ]
+        found = {name for manifest in selected for name in (manifest["project"], Path(manifest["project"]).name)}
+        unknown = [project for project in options.projects if project not in found]
+        if unknown:
+            print(f"Error: No integration manifest for: {', '.join(unknown)}")
+            print(f"Projects are recorded in {INTEGRATION_MANIFEST_DIR}/ when they are added")
+            sys.exit(1)
+        manifests = selected
+
+    # Each project is reintegrated with the options of the template it was added from (see the
+    # registry), falling back to the top-level options for projects the registry doesn't know
+    templates = load_monorepo_config(monorepo_root).get("templates") or {}
+    plans: dict[Optional[str], IntegrationPlan] = {}
+    files = MonorepoFiles(monorepo_root)
+    resynced: dict[Path, str] = {}
+    changed = 0
+    for manifest in manifests:
+        project_path = monorepo_root / manifest["project"]
+        if not project_path.is_dir():
+            print(f"⚠️  {manifest['project']} no longer exists, skipping")
+            if files.projects.pop(manifest["project"], None):
+                print(f"   Removed it from {PROJECT_REGISTRY}")
+                files.mark_changed(PROJECT_REGISTRY)
+            continue
+
+        template_key = files.projects.get(manifest["project"], {}).get("template")
+        if template_key not in templates:
+            template_key = None
+        if template_key not in plans:
+            plans[template_key] = IntegrationPlan.from_config(monorepo_root, templates.get(template_key))
+
+        rerun = reintegrate_project(manifest, monorepo_root, files, plans[template_key])
+        if rerun:
+            changed += 1
+        if "add-to-workspace" in rerun:
+            resynced[project_path] = manifest["prepared"]["project_type"]
+
+    written = files.flush()
+    if written:
+        print(f"\nUpdated {', '.join(written)}")
+
+    print(f"\n✓ Reintegrated {changed} project(s), {len(manifests) - changed} up to date")
+
+    if resynced:
+        sync_workspaces(monorepo_root, resynced, options.sync)
+
+
+def sync_workspaces(monorepo_root: Path, projects: dict[Path, str], mode: str = "scoped") -> None:
+    """
+    Sync the uv and/or npm workspaces for newly added projects ({project path: project type}).
+
+    In scoped mode only the new members and their dependencies are installed (uv sync --package,
+    npm install --workspace), and when the lockfiles already cover all their external dependencies
+    the packages come from the lockfile and local cache without resolving against the network. In
+    full mode the whole monorepo is synced.
+
+    uv and npm work on separate trees and caches, so for hybrid projects both commands run
+    concurrently. Their output is streamed with a prefix per command.
+    """
     print("\nUpdating workspaces...")
 
-    if project_type in ["python", "hybrid"]:
-        try:
-            subprocess.run(["uv", "sync"], cwd=monorepo_root, check=True, capture_output=True)
-            print("  ✓ Python workspace synced (uv)")
-        except subprocess.CalledProcessError:
-            print("  Warning: Failed to run 'uv sync' - you may need to run it manually")
+    python_projects = [path for path, project_type in projects.items() if project_type in ("python", "hybrid")]
+    typescript_projects = [path for path, project_type in projects.items() if project_type in ("typescript", "hybrid")]
 
-    if project_type in ["typescript", "hybrid"]:
+    # (label, command, fallback command if it fails, message on success)
+    commands = []
+    if python_projects:
+        command, fallback = uv_sync_commands(monorepo_root, python_projects, mode)
+        commands.append(("uv sync", command, fallback, "Python workspace synced (uv)"))
+    if typescript_projects:
         # Try npm install (will use pnpm/yarn if configured)
+        command = npm_install_command(monorepo_root, typescript_projects, mode)
+        commands.append(("npm install", command, None, "TypeScript workspace synced (npm)"))
+    if not commands:
+        return
+
+    for _label, command, _fallback, _message in commands:
+        print(f"  Running: {' '.join(command)}")
+    results = run_prefixed_commands(
+        [(label, command) for label, command, _fallback, _message in commands], monorepo_root
+    )
+
+    for label, _command, fallback, message in commands:
+        if results[label].returncode is not None and not results[label].ok and fallback:
+            # The lockfile couldn't satisfy the new member offline, resolve it properly
+            print(f"  Running: {' '.join(fallback)}")
+            results.update(run_prefixed_commands([(label, fallback)], monorepo_root))
+
+        if results[label].ok:
+            print(f"  ✓ {message}")
+        else:
+            print(f"  Warning: {results[label].describe_failure(SYNC_TIMEOUT_SECONDS)}")
+            print(f"  Run '{label}' manually to finish setting up the workspace")
+
+    if len(results) > 1:
+        # The slowest command decides how long the sync takes
+        timings = ", ".join(f"{label} {result.seconds:.1f}s" for label, result in results.items())
+        critical = max(results, key=lambda label: results[label].seconds)
+        print(f"  Critical path: {critical} ({timings})")
+
+
+def uv_sync_commands(
+    monorepo_root: Path, project_paths: list[Path], mode: str
+) -> tuple[list[str], Optional[list[str]]]:
+    """
+    uv command syncing the given workspace members, and the command to fall back to if it fails.
+
+    Scoped syncs keep the rest of the environment (--inexact) and run --offline when uv.lock already
+    locks every external dependency of the new members.
+    """
+    if mode != "scoped":
+        return ["uv", "sync"], None
+
+    locked = locked_python_packages(monorepo_root)
+    command = ["uv", "sync", "--inexact"]
+    new_dependencies = False
+    for project_path in project_paths:
+        metadata = python_project_metadata(project_path)
+        if metadata is None:
+            # Can't tell which package this is, sync everything
+            return ["uv", "sync"], None
+        name, dependencies = metadata
+        command += ["--package", name]
+        if locked is None or not dependencies <= locked:
+            new_dependencies = True
+
+    if new_dependencies:
+        return command, None
+    return command + ["--offline"], command
+
+
+def npm_install_command(monorepo_root: Path, project_paths: list[Path], mode: str) -> list[str]:
+    """
+    npm command installing the given workspaces.
+
+    Scoped installs prefer the local cache when package-lock.json already has every external
+    dependency of the new workspaces.
+    """
+    if mode != "scoped":
+        return ["npm", "install"]
+
+    locked = locked_npm_packages(monorepo_root)
+    command = ["npm", "install"]
+    new_dependencies = False
+    for project_path in project_paths:
+        command += ["--workspace", project_path.relative_to(monorepo_root).as_posix()]
+        if locked is None or not npm_dependencies(project_path) <= locked:
+            new_dependencies = True
+
+    if not new_dependencies:
+        command += ["--prefer-offline", "--no-audit", "--no-fund"]
+    return command
+
+
+def python_project_metadata(project_path: Path) -> Optional[tuple[str, set[str]]]:
+    """
+    Name and external dependency names (normalized) of a Python project, from its pyproject.toml.
+
+    Dependencies are those of python_requirements. Returns None if the file can't be parsed
+    (tomllib needs Python 3.11+).
+    """
+    try:
+        import tomllib
+    except ImportError:
+        return None
+
+    try:
+        with open(project_path / "pyproject.toml", "rb") as f:
+            pyproject = tomllib.load(f)
+    except (
+        OSError,
+        tomllib.TOMLDecodeError,
+    ):
+        return None
+
+    project = pyproject.get("project") or {}
+    if "name" not in project:
+        return None
+
+    return normalize_package_name(project["name"]), python_requirements(pyproject)
+
+
+def locked_python_packages(monorepo_root: Path) -> Optional[set[str]]:
+    """Names of all packages in uv.lock, or None if there is no readable lockfile"""
+    try:
+        import tomllib
+    except ImportError:
+        return None
+
+    try:
+        with open(monorepo_root / "uv.lock", "rb") as f:
+            lock = tomllib.load(f)
+    except (
+        OSError,
+        tomllib.TOMLDecodeError,
+    ):
+        return None
+
+    return {normalize_package_name(package["name"]) for package in lock.get("package", []) if "name" in package}
+
+
+def npm_dependencies(project_path: Path) -> set[str]:
+    """External dependency names of a TypeScript project, from its package.json"""
+    try:
+        package_data = json.loads((project_path / "package.json").read_text())
+    except (
+        OSError,
+        json.JSONDecodeError,
+    ):
+        return set()
+
+    dependencies = set()
+    for section in ("dependencies", "devDependencies", "optionalDependencies"):
+        dependencies.update(package_data.get(section) or {})
+    return dependencies
+
+
+def locked_npm_packages(monorepo_root: Path) -> Optional[set[str]]:
+    """Names of all packages installed by package-lock.json, or None if there is no readable lockfile"""
+    try:
+        lock = json.loads((monorepo_root / "package-lock.json").read_text())
+    except (
+        OSError,
+        json.JSONDecodeError,
+    ):
+        return None
+
+    # Keys look like "node_modules/react" or "node_modules/@types/node"
+    return {key.rsplit("node_modules/", 1)[1] for key in lock.get("packages", {}) if "node_modules/" in key}
+
+
+def run_prefixed_commands(commands: list[tuple[str, list[str]]], cwd: Path) -> dict[str, CommandResult]:
+    """
+    Run commands concurrently, streaming their combined stdout/stderr line by line as "    label | line".
+
+    Each command is killed after SYNC_TIMEOUT_SECONDS. Returns {label: result}.
+    """
+    print_lock = threading.Lock()
+    results: dict[str, CommandResult] = {}
+
+    def run(label: str, command: list[str]) -> None:
+        def print_line(line: str) -> None:
+            if line.strip():
+                with print_lock:
+                    print(f"    {label} | {line}", flush=True)
+
+        with TRACER.span(label, category="sync"):
+            results[label] = run_command(command, cwd=cwd, timeout=SYNC_TIMEOUT_SECONDS, on_line=print_line)
+
+    threads = [threading.Thread(target=run, args=(label, command)) for label, command in commands]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {label: results[label] for label, _command in commands}
+
+
+def prepare_template(template_key: str, template_config: dict[str, Any], monorepo_root: Path) -> tuple[Path, str]:
+    """Fetch the pinned commit of a template into the template cache, returning its checkout and the commit"""
+    # Determine template type (default to cookiecutter for backward compatibility)
+    template_type = template_config.get("template_type", "cookiecutter")
+    if template_type not in ("cookiecutter", "github-template"):
+        print(f"Error: Unknown template_type '{template_type}'")
+        print("Supported types: 'cookiecutter', 'github-template'")
+        sys.exit(1)
+
+    with TRACER.span("resolve template version", category="network", template=template_key):
+        template_sha = resolve_locked_template(template_key, template_config, monorepo_root)
+    with TRACER.span("fetch template", category="fetch", template=template_key):
+        template_dir = fetch_template(
+            template_config, monorepo_root, template_sha, sparse=template_type == "cookiecutter"
+        )
+    return template_dir, template_sha
+
+
+def generate_project(
+    template_config: dict[str, Any],
+    project_name: str,
+    monorepo_root: Path,
+    template_dir: Path,
+    engine: Optional[str] = None,
+) -> Path:
+    """Generate a project from a prepared template checkout into its target directory"""
+    # Determine target directory
+    target_dir_name = template_config.get("target_dir", "packages")
+    target_dir = monorepo_root / target_dir_name
+
+    if not target_dir.exists():
+        print(f"Creating directory: {target_dir}")
+        target_dir.mkdir(parents=True)
+
+    # Generate/clone the project based on template type
+    if template_config.get("template_type", "cookiecutter") == "github-template":
+        return clone_github_template(template_config, project_name, target_dir, template_dir)
+
+    engine = engine or template_config.get("engine", "auto")
+    if engine not in COOKIECUTTER_ENGINES:
+        print(f"Error: Unknown engine '{engine}'")
+        print(f"Supported engines: {', '.join(COOKIECUTTER_ENGINES)}")
+        sys.exit(1)
+    project_path = run_cookiecutter(template_config, project_name, target_dir, template_dir, engine)
+
+    # Move nested project if needed (extract from workspace wrapper)
+    if "integrate_path" in template_config:
+        with TRACER.span("move nested project", category="generate"):
+            project_path = move_nested_project(project_path, target_dir)
+
+    return project_path
+
+
+def load_batch_manifest(manifest_path: Path, templates: dict[str, Any]) -> list[dict[str, str]]:
+    """
+    Load and validate a batch manifest:
+
+        projects:
+          - template: api
+            name: user-service
+          - template: cli
+            name: admin-cli
+    """
+    if not manifest_path.exists():
+        print(f"Error: Manifest not found: {manifest_path}")
+        sys.exit(1)
+
+    with open(manifest_path) as f:
+        manifest = yaml.safe_load(f) or {}
+
+    projects = manifest.get("projects") or []
+    if not projects:
+        print(f"Error: No projects listed in {manifest_path}")
+        print("Add entries with 'template' and 'name' to the 'projects' section")
+        sys.exit(1)
+
+    errors = []
+    seen = set()
+    for index, entry in enumerate(projects, start=1):
+        if not isinstance(entry, dict) or "template" not in entry or "name" not in entry:
+            errors.append(f"  Entry {index}: needs 'template' and 'name'")
+            continue
+        if entry["template"] not in templates:
+            errors.append(f"  Entry {index}: template type '{entry['template']}' not found in configuration")
+            continue
+        target = (templates[entry["template"]].get("target_dir", "packages"), str(entry["name"]).lower())
+        if target in seen:
+            errors.append(f"  Entry {index}: '{entry['name']}' is listed more than once for {target[0]}/")
+        seen.add(target)
+
+    if errors:
+        print(f"Error: Invalid manifest {manifest_path}")
+        for error in errors:
+            print(error)
+        print(f"\nAvailable templates: {', '.join(templates.keys())}")
+        sys.exit(1)
+
+    return [{"template": str(entry["template"]), "name": str(entry["name"])} for entry in projects]
+
+
+def generate_batch_project(
+    template_key: str,
+    template_config: dict[str, Any],
+    project_name: str,
+    monorepo_root: Path,
+    template_dir: Path,
+    engine: Optional[str],
+    plan: IntegrationPlan,
+    in_worker: bool,
+    trace: bool = False,
+) -> tuple[Optional[PreparedProject], str, list[dict[str, Any]]]:
+    """
+    Generate one batch project and run its project-local integration steps.
+
+    Runs in a worker process (in_worker) when batch mode is parallel. The project's progress output
+    is then returned instead of printed, so logs of concurrent projects don't interleave, and with
+    trace its spans are returned for the parent's trace. Returns (None, log, spans) if the project
+    failed.
+    """
+    import traceback
+
+    if in_worker:
+        # Worker processes are reused, only return the spans of this project
+        TRACER.enabled = trace
+        TRACER.events = []
+
+    log = io.StringIO()
+    output = contextlib.redirect_stdout(log) if in_worker else contextlib.nullcontext()
+    prepared = None
+    with output, TRACER.span("generate and prepare", category="batch", project=project_name):
+        print(f"\n=== {project_name} ({template_key}) ===")
         try:
-            subprocess.run(["npm", "install"], cwd=monorepo_root, check=True, capture_output=True)
-            print("  ✓ TypeScript workspace synced (npm)")
-        except subprocess.CalledProcessError:
-            print("  Warning: Failed to run 'npm install' - you may need to run it manually")
+            project_path = generate_project(template_config, project_name, monorepo_root, template_dir, engine)
+            print(f"\nIntegrating {project_path.name} into monorepo...")
+            prepared = prepare_project_integration(project_path, monorepo_root, plan)
+        except SystemExit:
+            # Errors are reported with print() + sys.exit(); the message is already in the log
+            pass
+        except Exception:
+            print(traceback.format_exc(), end="")
+
+    return prepared, log.getvalue(), TRACER.events if in_worker else []
+
+
+def batch_command(monorepo_root: Path, args: list[str]) -> None:
+    """Add all projects listed in a manifest: `batch manifest.yaml [--engine ENGINE] [--jobs N]`"""
+    import argparse
+    from concurrent.futures import ProcessPoolExecutor
+
+    parser = argparse.ArgumentParser(
+        prog="add-project.py batch",
+        description="Add many projects in one run, syncing the workspaces once at the end",
+    )
+    parser.add_argument("manifest", type=Path, help="YAML file with a 'projects' list of {template, name}")
+    parser.add_argument("--engine", choices=COOKIECUTTER_ENGINES, default=None, help="How to run cookiecutter")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="Projects generated in parallel (default: CPU count)"
+    )
+    parser.add_argument(
+        "--sync",
+        choices=SYNC_MODES,
+        default="scoped",
+        help="Sync only the new projects (scoped, default) or the whole monorepo (full)",
+    )
+    parser.add_argument("--trace", type=Path, default=None, metavar="OUT.json", help="Write a Chrome trace of the run")
+    options = parser.parse_args(args)
+
+    if options.trace:
+        TRACER.enable(options.trace)
+
+    templates = load_template_config(monorepo_root)
+    projects = load_batch_manifest(options.manifest, templates)
+
+    jobs = min(options.jobs or os.cpu_count() or 1, len(projects))
+    if jobs < 1:
+        print("Error: --jobs must be at least 1")
+        sys.exit(1)
+
+    # Templates without defaults prompt for their variables, which needs the terminal
+    interactive = sorted(
+        {
+            entry["template"]
+            for entry in projects
+            if templates[entry["template"]].get("template_type", "cookiecutter") == "cookiecutter"
+            and "defaults" not in templates[entry["template"]]
+        }
+    )
+    if interactive and jobs > 1:
+        print(f"⚠️  Template(s) without defaults prompt interactively: {', '.join(interactive)}")
+        print("   Generating projects one at a time")
+        jobs = 1
+
+    # Integration steps can be configured per template (checked before generating anything)
+    plans = {key: IntegrationPlan.from_config(monorepo_root, templates[key]) for key in templates}
+
+    # Each template is fetched once and shared by all projects generated from it
+    template_dirs: dict[str, Path] = {}
+    template_shas: dict[str, str] = {}
+    for template_key in dict.fromkeys(entry["template"] for entry in projects):
+        template_dirs[template_key], template_shas[template_key] = prepare_template(
+            template_key, templates[template_key], monorepo_root
+        )
+
+    # Create target directories up front so parallel workers don't race to create them
+    for template_key in template_dirs:
+        (monorepo_root / templates[template_key].get("target_dir", "packages")).mkdir(parents=True, exist_ok=True)
+
+    def worker_args(
+        entry: dict[str, str],
+    ) -> tuple[str, dict[str, Any], str, Path, Path, Optional[str], IntegrationPlan]:
+        template_key = entry["template"]
+        template_dir = template_dirs[template_key]
+        return (
+            template_key,
+            templates[template_key],
+            entry["name"],
+            monorepo_root,
+            template_dir,
+            options.engine,
+            plans[template_key],
+        )
+
+    # Generate projects and run their project-local integration steps (in worker processes with
+    # --jobs > 1), then merge them into the shared monorepo files one at a time, in manifest order
+    files = MonorepoFiles(monorepo_root)
+    added: dict[Path, str] = {}
+    failed = []
+    with contextlib.ExitStack() as stack:
+        if jobs > 1:
+            print(f"\nGenerating {len(projects)} project(s) with {jobs} workers...")
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=jobs))
+            futures = [
+                executor.submit(generate_batch_project, *worker_args(entry), True, TRACER.enabled) for entry in projects
+            ]
+            results = (future.result() for future in futures)
+        else:
+            results = (generate_batch_project(*worker_args(entry), False) for entry in projects)
+
+        for entry, (prepared, log, spans) in zip(projects, results):
+            # Captured worker output and spans (empty when generating in this process)
+            print(log, end="")
+            TRACER.events.extend(spans)
+            if prepared is None:
+                print(f"  ✗ Failed to add {entry['name']}")
+                failed.append(entry)
+                continue
+
+            origin = {
+                "template": entry["template"],
+                "template_sha": template_shas[entry["template"]],
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+            with TRACER.span("merge", category="batch", project=entry["name"]):
+                merge_project_integration(prepared, monorepo_root, files, plans[entry["template"]], origin)
+            print("  ✓ Integration complete!")
+            added[prepared.project_path] = prepared.project_type
+
+    written = files.flush()
+    if written:
+        print(f"\nUpdated {', '.join(written)}")
+
+    # One workspace sync for all projects
+    sync_workspaces(monorepo_root, added, options.sync)
+
+    print(f"\n✓ Added {len(added)} project(s):")
+    for project_path in added:
+        print(f"  {project_path.relative_to(monorepo_root)}")
+    print("\nNext steps:")
+    print("  1. Review the generated code")
+    print("  2. Run tests: pytest")
+    print(f"  3. Commit: git add . && git commit -m 'Add {len(added)} projects'")
+
+    if failed:
+        print(f"\n✗ Failed to add {len(failed)} project(s) (see the output above):")
+        for entry in failed:
+            print(f"  {entry['name']} ({entry['template']})")
+        sys.exit(1)
+
+
+def format_size(num_bytes: float) -> str:
+    """Human-readable byte count"""
+    size = float(num_bytes)
+    unit = "B"
+    for next_unit in ("KB", "MB", "GB"):
+        if size < 1024:
+            break
+        size /= 1024
+        unit = next_unit
+    return f"{size:.0f} B" if unit == "B" else f"{size:.1f} {unit}"
+
+
+def cache_command(monorepo_root: Path, args: list[str]) -> None:
+    """Manage the local template cache: `cache prune [--max-size MB]`"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="add-project.py cache", description="Manage the local template cache")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    prune_parser = subparsers.add_parser("prune", help="Evict least recently used templates")
+    prune_parser.add_argument(
+        "--max-size",
+        type=float,
+        default=None,
+        help="Target cache size in MB (default: cache.max_size_mb from project-templates.yaml; 0 clears the cache)",
+    )
+    options = parser.parse_args(args)
+
+    cache = TemplateCache.from_config(monorepo_root)
+    if options.action == "prune":
+        max_bytes = None if options.max_size is None else int(options.max_size * 1024 * 1024)
+        removed, freed = cache.evict(max_bytes=max_bytes)
+        remaining = cache.entries()
+        print(f"Removed {removed} cached template(s), freed {format_size(freed)}")
+        print(
+            f"Cache now holds {len(remaining)} template(s), "
+            f"{format_size(sum(e.get('size', 0) for e in remaining))} in {cache.cache_dir.relative_to(monorepo_root)}"
+        )
+
+
+def lock_command(monorepo_root: Path, args: list[str]) -> None:
+    """Pin template versions to commits: `lock [--update] [template ...]`"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="add-project.py lock",
+        description=f"Pin each template's version to a commit SHA in {TEMPLATE_LOCK_FILE}",
+    )
+    parser.add_argument("templates", nargs="*", help="Templates to lock (default: all)")
+    parser.add_argument("--update", action="store_true", help="Re-resolve already pinned templates")
+    options = parser.parse_args(args)
+
+    templates = load_template_config(monorepo_root)
+    unknown = [key for key in options.templates if key not in templates]
+    if unknown:
+        print(f"Error: Template type(s) not found in configuration: {', '.join(unknown)}")
+        print(f"\nAvailable templates: {', '.join(templates.keys())}")
+        sys.exit(1)
+
+    cache = TemplateCache.from_config(monorepo_root)
+    locked = load_template_lock(monorepo_root)
+    selected = options.templates or list(templates.keys())
+
+    # Drop pins for templates that were removed from the configuration
+    for key in [key for key in locked if key not in templates]:
+        del locked[key]
+        print(f"  {key}: removed (no longer configured)")
+
+    for key in selected:
+        template_config = templates[key]
+        current = locked_sha(locked, key, template_config)
+        if current and not options.update:
+            print(f"  {key}: {current[:12]} (unchanged)")
+            continue
+
+        repo = template_config["repo"]
+        version = template_config.get("version", "main")
+        sha = resolve_template_sha(repo, version, cache)
+        locked[key] = {"repo": repo, "version": version, "sha": sha}
+        if current is None:
+            print(f"  {key}: pinned {version} → {sha[:12]}")
+        elif current != sha:
+            print(f"  {key}: {current[:12]} → {sha[:12]}")
+        else:
+            print(f"  {key}: {sha[:12]} (up to date)")
+
+    write_template_lock(monorepo_root, locked)
+    print(f"✓ Wrote {TEMPLATE_LOCK_FILE}")
+
+
+def prefetch_template(
+    template_key: str, template_config: dict[str, Any], sha: Optional[str], cache: TemplateCache
+) -> dict[str, Any]:
+    """Warm the template cache for one template (runs on a prefetch worker thread)"""
+    repo = template_config["repo"]
+    version = template_config.get("version", "main")
+    result: dict[str, Any] = {"template": template_key, "sha": sha, "status": "cached", "downloaded": 0}
+
+    start = time.perf_counter()
+    try:
+        if sha is None:
+            sha = resolve_template_sha(repo, version, cache)
+            result["sha"] = sha
+
+        cached_dir = cache.lookup(repo, sha)
+        if cached_dir is None:
+            cached_dir, result["downloaded"] = download_template(repo, version, sha, cache)
+            result["status"] = "fetched"
+        if template_config.get("template_type", "cookiecutter") == "github-template":
+            load_placeholder_index(cached_dir)
+        result["size"] = directory_size(cached_dir)
+    except subprocess.CalledProcessError as e:
+        result["status"] = "failed"
+        result["error"] = (e.stderr or str(e)).strip().splitlines()[-1:]
+    except SystemExit:
+        # resolve_template_sha already printed the reason
+        result["status"] = "failed"
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def prefetch_command(monorepo_root: Path, args: list[str]) -> None:
+    """Fetch every configured template into the template cache: `prefetch [--jobs N] [template ...]`"""
+    import argparse
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    parser = argparse.ArgumentParser(
+        prog="add-project.py prefetch",
+        description="Fetch templates into the local template cache in parallel",
+    )
+    parser.add_argument("templates", nargs="*", help="Templates to fetch (default: all)")
+    parser.add_argument("-j", "--jobs", type=int, default=8, help="Maximum concurrent git fetches (default: 8)")
+    options = parser.parse_args(args)
+
+    templates = load_template_config(monorepo_root)
+    unknown = [key for key in options.templates if key not in templates]
+    if unknown:
+        print(f"Error: Template type(s) not found in configuration: {', '.join(unknown)}")
+        print(f"\nAvailable templates: {', '.join(templates.keys())}")
+        sys.exit(1)
+
+    selected = options.templates or list(templates.keys())
+    if not selected:
+        print("No templates configured in .monorepo/project-templates.yaml")
+        return
+
+    cache = TemplateCache.from_config(monorepo_root)
+    locked = load_template_lock(monorepo_root)
+    jobs = max(1, min(options.jobs, len(selected)))
+
+    print(f"Prefetching {len(selected)} template(s) with {jobs} parallel fetch(es)...")
+    start = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(prefetch_template, key, templates[key], locked_sha(locked, key, templates[key]), cache)
+            for key in selected
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"  {result['template']}: {result['status']} ({result['seconds']:.1f}s)")
+    elapsed = time.perf_counter() - start
+
+    # Pin newly resolved templates (written once, from this thread)
+    newly_pinned = False
+    for result in results:
+        key = result["template"]
+        if result["status"] != "failed" and key not in locked:
+            template_config = templates[key]
+            locked[key] = {
+                "repo": template_config["repo"],
+                "version": template_config.get("version", "main"),
+                "sha": result["sha"],
+            }
+            newly_pinned = True
+    if newly_pinned:
+        write_template_lock(monorepo_root, locked)
+
+    # Report, slowest first, so heavy template repos stand out
+    print(f"\n{'Template':<24} {'Commit':<12}  {'Status':<8} {'Time':>7} {'Fetched':>10} {'Size':>10}")
+    for result in sorted(results, key=lambda r: r["seconds"], reverse=True):
+        sha = (result["sha"] or "")[:12]
+        print(
+            f"{result['template']:<24} {sha:<12}  {result['status']:<8} {result['seconds']:>6.1f}s "
+            f"{format_size(result['downloaded']):>10} {format_size(result.get('size', 0)):>10}"
+        )
+        for line in result.get("error", []):
+            print(f"    {line}")
+
+    failed = [r for r in results if r["status"] == "failed"]
+    total_downloaded = sum(r["downloaded"] for r in results)
+    print(f"\nFetched {format_size(total_downloaded)} in {elapsed:.1f}s")
+    if failed:
+        print(f"Error: {len(failed)} template(s) could not be fetched")
+        sys.exit(1)
+
+
+# Subcommands (these names can't be used as template types)
+COMMANDS = {
+    "batch": batch_command,
+    "cache": cache_command,
+    "lock": lock_command,
+    "prefetch": prefetch_command,
+    "reintegrate": reintegrate_command,
+}
 
 
 def main() -> None:
     """Main entry point"""
-    if len(sys.argv) != 3:
-        print("Usage: ./scripts/add-project.py <template-type> <project-name>")
+    # Find monorepo root
+    monorepo_root = Path(__file__).parent.parent.absolute()
+
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        COMMANDS[sys.argv[1]](monorepo_root, sys.argv[2:])
+        return
+
+    if len(sys.argv) < 3:
+        print("Usage: ./scripts/add-project.py <template-type> <project-name> [options]")
+        print("  --engine ENGINE   auto, in-process or subprocess")
+        print("  --sync MODE       scoped (only the new project, default) or full")
+        print("  --trace OUT.json  Write a Chrome trace of the run")
         print("\nExample:")
         print("  ./scripts/add-project.py cli my-awesome-cli")
         print("  ./scripts/add-project.py api user-service")
+        print("\nOther commands:")
+        print("  ./scripts/add-project.py batch <manifest.yaml> [--engine ENGINE] [--jobs N] [--trace OUT.json]")
+        print("  ./scripts/add-project.py lock [--update] [template ...]")
+        print("  ./scripts/add-project.py prefetch [--jobs N] [template ...]")
+        print("  ./scripts/add-project.py reintegrate [project ...]")
+        print("  ./scripts/add-project.py cache prune [--max-size MB]")
         print("\nAvailable templates are defined in .monorepo/project-templates.yaml")
         sys.exit(1)
 
-    template_type = sys.argv[1]
-    project_name = sys.argv[2]
-
-    # Find monorepo root
-    monorepo_root = Path(__file__).parent.parent.absolute()
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="add-project.py", description="Add a project from a template")
+    parser.add_argument("template_type", help="Template type from .monorepo/project-templates.yaml")
+    parser.add_argument("project_name", help="Name of the new project")
+    parser.add_argument(
+        "--engine",
+        choices=COOKIECUTTER_ENGINES,
+        default=None,
+        help="How to run cookiecutter (default: the template's 'engine' setting, or auto)",
+    )
+    parser.add_argument(
+        "--sync",
+        choices=SYNC_MODES,
+        default="scoped",
+        help="Sync only the new project (scoped, default) or the whole monorepo (full)",
+    )
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        default=None,
+        metavar="OUT.json",
+        help="Write a Chrome trace (wall time, bytes, subprocess time per step) of the run",
+    )
+    options = parser.parse_args()
+
+    if options.trace:
+        TRACER.enable(options.trace)
+
+    template_type = options.template_type
+    project_name = options.project_name
 
     # Load template configuration
     templates = load_template_config(monorepo_root)
@@ -713,33 +3580,22 @@ def main() -> None:
 
     template_config = templates[template_type]
 
-    # Determine target directory
-    target_dir_name = template_config.get("target_dir", "packages")
-    target_dir = monorepo_root / target_dir_name
-
-    if not target_dir.exists():
-        print(f"Creating directory: {target_dir}")
-        target_dir.mkdir(parents=True)
-
-    # Determine template type (default to cookiecutter for backward compatibility)
-    template_type = template_config.get("template_type", "cookiecutter")
-
-    # Generate/clone the project based on template type
-    if template_type == "github-template":
-        project_path = clone_github_template(template_config, project_name, target_dir)
-    elif template_type == "cookiecutter":
-        project_path = run_cookiecutter(template_config, project_name, target_dir)
+    # Check the integration settings before generating anything
+    plan = IntegrationPlan.from_config(monorepo_root, template_config)
 
-        # Move nested project if needed (extract from workspace wrapper)
-        if "integrate_path" in template_config:
-            project_path = move_nested_project(project_path, target_dir)
-    else:
-        print(f"Error: Unknown template_type '{template_type}'")
-        print("Supported types: 'cookiecutter', 'github-template'")
-        sys.exit(1)
+    # Fetch the template and generate the project
+    template_dir, template_sha = prepare_template(template_type, template_config, monorepo_root)
+    with TRACER.span("generate", category="generate", template=template_type, project=project_name):
+        project_path = generate_project(template_config, project_name, monorepo_root, template_dir, options.engine)
 
     # Integrate with monorepo
-    integrate_project(project_path, monorepo_root)
+    with TRACER.span("integrate", category="integrate", project=project_path.name):
+        origin = {
+            "template": template_type,
+            "template_sha": template_sha,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        integrate_project(project_path, monorepo_root, sync=options.sync, plan=plan, origin=origin)
 
     print(f"\n✓ Project '{project_name}' added successfully!")
     print(f"  Location: {project_path.relative_to(monorepo_root)}")
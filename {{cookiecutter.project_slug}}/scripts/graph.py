@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Workspace dependency graph of the monorepo.
+
+Members are the directories matched by the uv workspace ([tool.uv.workspace] members and exclude
+in the root pyproject.toml) and by the npm workspaces (the root package.json "workspaces"). A
+member depends on another member when:
+
+- Python: it requires the other member's package (dependencies, optional dependencies or
+  dependency groups) and the package has a { workspace = true } source in the member's or the
+  root's [tool.uv.sources] - without one, uv installs it from the index instead
+- TypeScript: it lists the other member's package in dependencies, devDependencies,
+  peerDependencies or optionalDependencies
+
+Members also declare tasks (run by `monorepo.py run`): package.json scripts, and commands in a
+[tool.monorepo.tasks] table of pyproject.toml, run in the member directory:
+
+    [tool.monorepo.tasks]
+    test = "uv run pytest"
+    lint = ["uv", "run", "ruff", "check", "."]
+
+Parsed manifests are cached in .monorepo/graph.json (git-ignored). A manifest is read again only
+when its size or modification time changed, and parsed again only when its content hash changed.
+Stale manifests are read and parsed in parallel.
+
+Usage:
+    ./scripts/graph.py                                # Members and their workspace dependencies
+    ./scripts/graph.py --json                         # The same as JSON
+    ./scripts/graph.py --dependents packages/core     # Members affected by a change to packages/core
+
+    from graph import load_graph
+
+    graph = load_graph(monorepo_root)
+    affected = graph.dependents_of(["packages/core"])
+"""
+
+import glob
+import hashlib
+import json
+import os
+import shlex
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from package_metadata import normalize_package_name, python_requirements
+
+GRAPH_CACHE = ".monorepo/graph.json"
+
+# Bump when the cached data changes shape, so old caches are rebuilt instead of misread
+GRAPH_CACHE_VERSION = 2
+
+# Dependency sections of package.json that npm links workspace members for
+NPM_DEPENDENCY_SECTIONS = ("dependencies", "devDependencies", "peerDependencies", "optionalDependencies")
+
+# Threads reading and parsing stale manifests
+MAX_PARSE_WORKERS = 16
+
+
+def parse_pyproject(content: bytes) -> dict[str, Any]:
+    """Package name, required package names and workspace sources of a pyproject.toml"""
+    try:
+        import tomllib
+    except ImportError:
+        print("Error: Reading pyproject.toml needs Python 3.11+ (tomllib)")
+        sys.exit(1)
+
+    try:
+        pyproject = tomllib.loads(content.decode())
+    except (
+        UnicodeDecodeError,
+        tomllib.TOMLDecodeError,
+    ) as e:
+        return {"error": str(e)}
+
+    project = pyproject.get("project") or {}
+    tool = pyproject.get("tool") or {}
+    uv = tool.get("uv") or {}
+    sources = uv.get("sources") or {}
+    workspace = uv.get("workspace") or {}
+    return {
+        "name": normalize_package_name(project["name"]) if "name" in project else None,
+        "dependencies": sorted(python_requirements(pyproject)),
+        "workspace_sources": sorted(
+            normalize_package_name(name)
+            for name, source in sources.items()
+            if isinstance(source, dict) and source.get("workspace")
+        ),
+        "members": list(workspace.get("members") or []),
+        "exclude": list(workspace.get("exclude") or []),
+        # Commands as argument lists
+        "tasks": {
+            name: shlex.split(command) if isinstance(command, str) else [str(arg) for arg in command]
+            for name, command in ((tool.get("monorepo") or {}).get("tasks") or {}).items()
+            if isinstance(command, (str, list))
+        },
+    }
+
+
+def parse_package_json(content: bytes) -> dict[str, Any]:
+    """Package name, dependency names and workspaces of a package.json"""
+    try:
+        package_data = json.loads(content)
+    except (
+        UnicodeDecodeError,
+        json.JSONDecodeError,
+    ) as e:
+        return {"error": str(e)}
+
+    dependencies = set()
+    for section in NPM_DEPENDENCY_SECTIONS:
+        dependencies.update(package_data.get(section) or {})
+
+    # "workspaces": [...] or (yarn) "workspaces": {"packages": [...]}
+    workspaces = package_data.get("workspaces") or []
+    if isinstance(workspaces, dict):
+        workspaces = workspaces.get("packages") or []
+    return {
+        "name": package_data.get("name"),
+        "dependencies": sorted(dependencies),
+        "workspaces": list(workspaces),
+        "scripts": sorted(package_data.get("scripts") or {}),
+    }
+
+
+MANIFEST_PARSERS = {"pyproject.toml": parse_pyproject, "package.json": parse_package_json}
+
+
+def read_manifest(path: Path, stat: os.stat_result, cached: Optional[dict[str, Any]]) -> dict[str, Any]:
+    """Cache entry of a manifest whose size or modification time changed, parsed again only if its content did"""
+    content = path.read_bytes()
+    digest = hashlib.sha256(content).hexdigest()
+    if cached and cached["hash"] == digest:
+        parsed = cached["parsed"]
+    else:
+        parsed = MANIFEST_PARSERS[path.name](content)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest, "parsed": parsed}
+
+
+def expand_globs(monorepo_root: Path, patterns: Iterable[str], manifest: str) -> set[str]:
+    """Directories (relative, POSIX) matched by workspace globs that contain a manifest file"""
+    # Globbing for the manifest itself saves a stat() per matched directory
+    root = os.path.join(glob.escape(str(monorepo_root)), "")
+    directories = set()
+    for pattern in patterns:
+        for path in glob.glob(root + os.path.join(pattern.rstrip("/"), manifest)):
+            directories.add(os.path.dirname(path[len(root) :]).replace(os.sep, "/"))
+    return directories
+
+
+@dataclass
+class Member:
+    """A workspace member"""
+
+    path: str
+    # "python", "typescript" or "hybrid" (member of both workspaces)
+    type: str
+    python_name: Optional[str] = None
+    npm_name: Optional[str] = None
+    # Paths of the members it depends on
+    dependencies: list[str] = field(default_factory=list)
+    # Command of each task by kind: "python" for the pyproject.toml task, "typescript" for the
+    # package.json script (hybrid members can have both, run in this order)
+    tasks: dict[str, dict[str, list[str]]] = field(default_factory=dict)
+
+    def task_commands(self, task: str, kind: Optional[str] = None) -> list[list[str]]:
+        """Commands of a task, run in the member directory one after another (only those of kind)"""
+        return [command for command_kind, command in self.tasks.get(task, {}).items() if kind in (None, command_kind)]
+
+
+class WorkspaceGraph:
+    """Workspace members by path, with their dependencies and (reverse) dependents"""
+
+    def __init__(self, members: dict[str, Member]) -> None:
+        self.members = dict(sorted(members.items()))
+        self.dependents: dict[str, list[str]] = {path: [] for path in self.members}
+        for path, member in self.members.items():
+            for dependency in member.dependencies:
+                self.dependents[dependency].append(path)
+
+    def dependents_of(self, paths: Iterable[str]) -> set[str]:
+        """The members and everything depending on them, directly or indirectly"""
+        return self._closure(paths, self.dependents)
+
+    def dependencies_of(self, paths: Iterable[str]) -> set[str]:
+        """The members and everything they depend on, directly or indirectly"""
+        return self._closure(paths, {path: member.dependencies for path, member in self.members.items()})
+
+    def _closure(self, paths: Iterable[str], edges: dict[str, list[str]]) -> set[str]:
+        seen = {path for path in paths if path in self.members}
+        pending = list(seen)
+        while pending:
+            for neighbour in edges[pending.pop()]:
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    pending.append(neighbour)
+        return seen
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "members": {
+                path: {
+                    "type": member.type,
+                    "python_name": member.python_name,
+                    "npm_name": member.npm_name,
+                    "dependencies": member.dependencies,
+                    "dependents": self.dependents[path],
+                    "tasks": sorted(member.tasks),
+                }
+                for path, member in self.members.items()
+            }
+        }
+
+
+def load_graph(monorepo_root: Path, use_cache: bool = True) -> WorkspaceGraph:
+    """
+    Build the workspace dependency graph, re-reading only manifests that changed since the cached
+    graph (see GRAPH_CACHE). With use_cache=False all manifests are parsed again.
+    """
+    cache_path = monorepo_root / GRAPH_CACHE
+    cache: dict[str, Any] = {}
+    if use_cache and cache_path.exists():
+        try:
+            cache = json.loads(cache_path.read_text())
+        except json.JSONDecodeError:
+            cache = {}
+        if cache.get("version") != GRAPH_CACHE_VERSION:
+            cache = {}
+    cached_manifests: dict[str, dict[str, Any]] = cache.get("manifests") or {}
+    manifests: dict[str, dict[str, Any]] = {}
+
+    def refresh(paths: list[str]) -> None:
+        # Unchanged stat: reuse the cache entry. Otherwise read (and maybe parse) in a thread.
+        stale = []
+        for rel_path in paths:
+            try:
+                stat = os.stat(os.path.join(monorepo_root, rel_path))
+            except FileNotFoundError:
+                continue
+            cached = cached_manifests.get(rel_path)
+            if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+                manifests[rel_path] = cached
+            else:
+                stale.append((rel_path, monorepo_root / rel_path, stat, cached))
+
+        if len(stale) == 1:
+            rel_path, path, stat, cached = stale[0]
+            manifests[rel_path] = read_manifest(path, stat, cached)
+        elif stale:
+            with ThreadPoolExecutor(max_workers=min(MAX_PARSE_WORKERS, len(stale))) as executor:
+                entries = executor.map(lambda item: read_manifest(*item[1:]), stale)
+                for (rel_path, *_), entry in zip(stale, entries):
+                    manifests[rel_path] = entry
+
+    # Root manifests first: they declare the members
+    refresh(["pyproject.toml", "package.json"])
+    root_pyproject = (manifests.get("pyproject.toml") or {}).get("parsed") or {}
+    root_package_json = (manifests.get("package.json") or {}).get("parsed") or {}
+
+    python_members = expand_globs(monorepo_root, root_pyproject.get("members", []), "pyproject.toml") - expand_globs(
+        monorepo_root, root_pyproject.get("exclude", []), "pyproject.toml"
+    )
+    npm_members = expand_globs(monorepo_root, root_package_json.get("workspaces", []), "package.json")
+
+    refresh(
+        [f"{path}/pyproject.toml" for path in sorted(python_members)]
+        + [f"{path}/package.json" for path in sorted(npm_members)]
+    )
+
+    for rel_path, entry in manifests.items():
+        if "error" in entry["parsed"]:
+            print(f"⚠️  Could not parse {rel_path}: {entry['parsed']['error']}", file=sys.stderr)
+
+    members: dict[str, Member] = {}
+    for path in sorted(python_members | npm_members):
+        is_python = path in python_members
+        is_npm = path in npm_members
+        pyproject = manifests[f"{path}/pyproject.toml"]["parsed"] if is_python else {}
+        package_json = manifests[f"{path}/package.json"]["parsed"] if is_npm else {}
+
+        tasks: dict[str, dict[str, list[str]]] = {}
+        for name, command in pyproject.get("tasks", {}).items():
+            tasks.setdefault(name, {})["python"] = command
+        for name in package_json.get("scripts", []):
+            tasks.setdefault(name, {})["typescript"] = ["npm", "run", name]
+
+        members[path] = Member(
+            path=path,
+            type="hybrid" if is_python and is_npm else "python" if is_python else "typescript",
+            python_name=pyproject.get("name"),
+            npm_name=package_json.get("name"),
+            tasks=tasks,
+        )
+
+    python_packages = package_index(members, "python_name")
+    npm_packages = package_index(members, "npm_name")
+    root_sources = set(root_pyproject.get("workspace_sources", []))
+
+    for path, member in members.items():
+        dependencies = set()
+        if member.python_name is not None:
+            parsed = manifests[f"{path}/pyproject.toml"]["parsed"]
+            sources = root_sources | set(parsed.get("workspace_sources", []))
+            dependencies.update(
+                python_packages[name]
+                for name in parsed.get("dependencies", [])
+                if name in python_packages and name in sources
+            )
+        if member.npm_name is not None:
+            parsed = manifests[f"{path}/package.json"]["parsed"]
+            dependencies.update(npm_packages[name] for name in parsed.get("dependencies", []) if name in npm_packages)
+        dependencies.discard(path)
+        member.dependencies = sorted(dependencies)
+
+    graph = WorkspaceGraph(members)
+
+    updated = {"version": GRAPH_CACHE_VERSION, "manifests": dict(sorted(manifests.items())), **graph.to_json()}
+    if updated != cache:
+        # Write atomically: concurrent runs (e.g. pre-commit and CI scripts) may read the cache
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.tmp")
+        temp_path.write_text(json.dumps(updated, indent=2) + "\n")
+        os.replace(temp_path, cache_path)
+
+    return graph
+
+
+def package_index(members: dict[str, Member], attribute: str) -> dict[str, str]:
+    """Member paths by package name (python_name or npm_name); the first member wins a duplicate name"""
+    index: dict[str, str] = {}
+    for path, member in members.items():
+        name = getattr(member, attribute)
+        if name is None:
+            continue
+        if name in index:
+            print(f"⚠️  {path} and {index[name]} are both named {name}, using {index[name]}", file=sys.stderr)
+            continue
+        index[name] = path
+    return index
+
+
+def main() -> None:
+    """Main entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="graph.py", description="Show the workspace dependency graph")
+    parser.add_argument("--json", action="store_true", help="Print the graph as JSON")
+    parser.add_argument(
+        "--dependents",
+        nargs="+",
+        metavar="MEMBER",
+        default=None,
+        help="Only print the given members and the members depending on them",
+    )
+    parser.add_argument("--rebuild", action="store_true", help=f"Ignore {GRAPH_CACHE} and parse all manifests")
+    options = parser.parse_args()
+
+    monorepo_root = Path(__file__).parent.parent.absolute()
+    graph = load_graph(monorepo_root, use_cache=not options.rebuild)
+
+    if options.dependents is not None:
+        unknown = [path for path in options.dependents if path.rstrip("/") not in graph.members]
+        if unknown:
+            print(f"Error: Not a workspace member: {', '.join(unknown)}")
+            sys.exit(1)
+        affected = sorted(graph.dependents_of(path.rstrip("/") for path in options.dependents))
+        print(json.dumps(affected) if options.json else "\n".join(affected))
+        return
+
+    if options.json:
+        print(json.dumps(graph.to_json(), indent=2))
+        return
+
+    if not graph.members:
+        print("No workspace members")
+        return
+    for path, member in graph.members.items():
+        print(f"{path} ({member.type})")
+        for dependency in member.dependencies:
+            print(f"  -> {dependency}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Monorepo Tool - Work with the workspace members (see graph.py for how they are found)
+
+Commands:
+    affected    Members touched by a change: the members owning the changed files, and every
+                member depending on them (directly or indirectly)
+    run         Run a task (a package.json script or a [tool.monorepo.tasks] command) in every
+                member that has it, in dependency order, on a pool of CPU-count workers
+                (--type python runs only [tool.monorepo.tasks] commands, --type typescript only
+                package.json scripts)
+
+Usage:
+    ./scripts/monorepo.py affected --base origin/main            # Changes since the merge base with origin/main
+    ./scripts/monorepo.py affected --base origin/main --json     # As a JSON list
+    ./scripts/monorepo.py affected --base main --type python     # Only Python (and hybrid) members
+    ./scripts/monorepo.py affected apps/api/main.py              # Members affected by the given files
+
+    ./scripts/monorepo.py run test                               # All members with a test task
+    ./scripts/monorepo.py run build --jobs 4 apps/web            # Selected members
+    ./scripts/monorepo.py run lint --base origin/main            # Only affected members
+    ./scripts/monorepo.py run test --type typescript             # Only package.json scripts
+
+Without --head, `affected` compares the working tree (including untracked files) with the merge
+base, so uncommitted changes count. In CI the working tree is clean, so this is the same as
+comparing with HEAD. Changes to workspace-wide files (WORKSPACE_FILES, WORKSPACE_PREFIXES: root
+manifests and tool configs, .github/ and the scripts deciding what is affected) affect every member.
+
+`run` starts a member once the members it depends on have passed, and keeps going after a
+failure: only members depending on a failed member are skipped. It ends with a per-member summary
+and exits with status 1 if any member failed or was skipped.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+
+from graph import WorkspaceGraph, load_graph
+from process_runner import run_command
+
+GIT_TIMEOUT_SECONDS = 300
+TASK_TIMEOUT_SECONDS = 3600
+
+# TaskResult.status values, in summary order
+TASK_STATUSES = ("passed", "failed", "skipped")
+
+# Root files that every member is installed, linted or tested with: changing one affects all members
+WORKSPACE_FILES = frozenset(
+    {"pyproject.toml", "uv.lock", "package.json", "package-lock.json", "ruff.toml", "pyrightconfig.json"}
+)
+
+# Paths whose changes affect all members too: CI setup (workflows, actions), and the scripts that
+# work out what is affected and run the tasks
+WORKSPACE_PREFIXES = (
+    ".github/",
+    "scripts/graph.py",
+    "scripts/monorepo.py",
+    "scripts/package_metadata.py",
+    "scripts/process_runner.py",
+)
+
+# Member types selected by `affected --type` and `run --type` (hybrid members are both). run also
+# only runs the task commands of that kind (see Member.tasks)
+MEMBER_TYPES = {"python": ("python", "hybrid"), "typescript": ("typescript", "hybrid")}
+
+
+def changed_files(monorepo_root: Path, base: str, head: Optional[str] = None) -> Optional[list[str]]:
+    """
+    Files changed since the merge base of base and head (or the working tree, without head).
+
+    Renames count as a deletion and an addition, so both projects are affected. Returns None if
+    git can't tell, e.g. when base doesn't exist (the first push of a branch).
+    """
+    if head:
+        commands = [["git", "diff", "--name-only", "--no-renames", f"{base}...{head}"]]
+    else:
+        commands = [
+            ["git", "diff", "--name-only", "--no-renames", "--merge-base", base],
+            ["git", "ls-files", "--others", "--exclude-standard"],
+        ]
+
+    # Collected line by line: the result only keeps the tail of the output
+    files: list[str] = []
+    for command in commands:
+        result = run_command(command, cwd=monorepo_root, timeout=GIT_TIMEOUT_SECONDS, on_line=files.append)
+        if not result.ok:
+            print(f"⚠️  {result.describe_failure(GIT_TIMEOUT_SECONDS)}", file=sys.stderr)
+            if result.output:
+                print(result.output, file=sys.stderr)
+            return None
+    return [file_path for file_path in files if file_path]
+
+
+def owning_member(graph: WorkspaceGraph, file_path: str) -> Optional[str]:
+    """The member containing a file (the innermost one if members are nested), None outside all members"""
+    parts = file_path.split("/")
+    for end in range(len(parts) - 1, 0, -1):
+        candidate = "/".join(parts[:end])
+        if candidate in graph.members:
+            return candidate
+    return None
+
+
+def affected_members(graph: WorkspaceGraph, files: Iterable[str]) -> set[str]:
+    """The members owning the files, and every member depending on them"""
+    owners = set()
+    for file_path in files:
+        if file_path in WORKSPACE_FILES or file_path.startswith(WORKSPACE_PREFIXES):
+            return set(graph.members)
+        owner = owning_member(graph, file_path)
+        if owner:
+            owners.add(owner)
+    return graph.dependents_of(owners)
+
+
+def affected_command(monorepo_root: Path, args: list[str]) -> None:
+    """Print the members affected by a change: `affected [--base REF [--head REF]] [--type TYPE] [--json] [file ...]`"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="monorepo.py affected",
+        description="Print the workspace members affected by changed files, including their dependents",
+    )
+    parser.add_argument("files", nargs="*", help="Changed files, relative to the monorepo root (instead of --base)")
+    parser.add_argument("--base", default=None, help="Git ref to compare with (its merge base with --head)")
+    parser.add_argument("--head", default=None, help="Git ref with the changes (default: the working tree)")
+    parser.add_argument("--type", choices=sorted(MEMBER_TYPES), default=None, help="Only print members of this type")
+    parser.add_argument("--json", action="store_true", help="Print a JSON list instead of one member per line")
+    options = parser.parse_args(args)
+
+    if bool(options.base) == bool(options.files):
+        print("Error: Pass either --base REF or the changed files")
+        sys.exit(1)
+
+    graph = load_graph(monorepo_root)
+    if options.files:
+        affected = affected_members(graph, [Path(file_path).as_posix() for file_path in options.files])
+    else:
+        files = changed_files(monorepo_root, options.base, options.head)
+        if files is None:
+            # Better to check everything than to skip a broken project
+            print(f"⚠️  Could not diff against {options.base}, treating all members as affected", file=sys.stderr)
+            affected = set(graph.members)
+        else:
+            affected = affected_members(graph, files)
+
+    if options.type:
+        affected = {path for path in affected if graph.members[path].type in MEMBER_TYPES[options.type]}
+
+    if options.json:
+        print(json.dumps(sorted(affected)))
+    else:
+        for path in sorted(affected):
+            print(path)
+
+
+@dataclass
+class TaskResult:
+    """Outcome of a task in one member"""
+
+    member: str
+    # "passed", "failed" or "skipped" (a dependency didn't pass)
+    status: str
+    seconds: float = 0.0
+    reason: str = ""
+
+
+def run_member_task(
+    monorepo_root: Path, member: str, commands: list[list[str]], print_lock: threading.Lock
+) -> TaskResult:
+    """Run a member's task commands one after another in its directory, streaming their output as "member | line" """
+
+    def print_line(line: str) -> None:
+        if line.strip():
+            with print_lock:
+                print(f"{member} | {line}", flush=True)
+
+    start = time.perf_counter()
+    for command in commands:
+        result = run_command(command, cwd=monorepo_root / member, timeout=TASK_TIMEOUT_SECONDS, on_line=print_line)
+        if not result.ok:
+            reason = result.describe_failure(TASK_TIMEOUT_SECONDS)
+            if result.returncode is None and not result.timed_out:
+                # Not started (e.g. npm isn't installed): the output holds the OS error
+                reason += f": {result.output}"
+            return TaskResult(member, "failed", time.perf_counter() - start, reason)
+    return TaskResult(member, "passed", time.perf_counter() - start)
+
+
+def run_task(
+    monorepo_root: Path,
+    graph: WorkspaceGraph,
+    task: str,
+    members: Iterable[str],
+    jobs: int,
+    kind: Optional[str] = None,
+) -> dict[str, TaskResult]:
+    """
+    Run a task in the members that have it, on a pool of jobs workers, in dependency order.
+
+    A member starts once every member it depends on (directly or through members without the
+    task) has passed. Failures don't stop the run; members depending on a failed member are
+    skipped. With kind ("python" or "typescript"), only the task commands of that kind run.
+    Returns the results in completion order.
+    """
+    from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+    commands = {path: graph.members[path].task_commands(task, kind) for path in members}
+    runnable = {path for path in members if commands[path]}
+    blockers = {path: (graph.dependencies_of([path]) & runnable) - {path} for path in runnable}
+    results: dict[str, TaskResult] = {}
+    pending = set(runnable)
+    running: dict[Future[TaskResult], str] = {}
+    print_lock = threading.Lock()
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            for path in sorted(pending):
+                failed = sorted(
+                    blocker for blocker in blockers[path] if blocker in results and results[blocker].status != "passed"
+                )
+                if failed:
+                    pending.discard(path)
+                    results[path] = TaskResult(path, "skipped", reason=f"{failed[0]} did not pass")
+
+            for path in sorted(pending):
+                if blockers[path] <= results.keys():
+                    pending.discard(path)
+                    running[executor.submit(run_member_task, monorepo_root, path, commands[path], print_lock)] = path
+
+            if not running:
+                # The remaining members wait for each other
+                for path in sorted(pending):
+                    results[path] = TaskResult(path, "skipped", reason="dependency cycle")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results[running.pop(future)] = result
+                with print_lock:
+                    mark = "✓" if result.status == "passed" else "✗"
+                    print(f"{mark} {result.member} ({result.seconds:.1f}s)", flush=True)
+
+    return results
+
+
+def run_command_line(monorepo_root: Path, args: list[str]) -> None:
+    """Run a task in every member that has it: `run <task> [member ...] [--base REF] [--type TYPE] [--jobs N]`"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="monorepo.py run",
+        description="Run a package.json script or [tool.monorepo.tasks] command in workspace members",
+    )
+    parser.add_argument("task", help="Task name, e.g. test, lint or build")
+    parser.add_argument("members", nargs="*", help="Members to run it in (default: all)")
+    parser.add_argument("--base", default=None, help="Only members affected by changes since this git ref")
+    parser.add_argument("--head", default=None, help="Git ref with the changes (default: the working tree)")
+    parser.add_argument(
+        "--type",
+        choices=sorted(MEMBER_TYPES),
+        default=None,
+        help="Only members of this type, and only their task commands of this kind "
+        "(python: [tool.monorepo.tasks], typescript: package.json scripts)",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="Members running at the same time (default: CPU count)"
+    )
+    # Options may come between the members
+    options = parser.parse_intermixed_args(args)
+
+    jobs = options.jobs or os.cpu_count() or 1
+    if jobs < 1:
+        print("Error: --jobs must be at least 1")
+        sys.exit(1)
+
+    graph = load_graph(monorepo_root)
+    members = set(graph.members)
+    if options.members:
+        selected = {Path(path).as_posix() for path in options.members}
+        unknown = sorted(selected - members)
+        if unknown:
+            print(f"Error: Not a workspace member: {', '.join(unknown)}")
+            sys.exit(1)
+        members = selected
+    if options.base:
+        files = changed_files(monorepo_root, options.base, options.head)
+        if files is not None:
+            members &= affected_members(graph, files)
+    if options.type:
+        members = {path for path in members if graph.members[path].type in MEMBER_TYPES[options.type]}
+
+    without_task = sorted(path for path in members if not graph.members[path].task_commands(options.task, options.type))
+    if len(without_task) == len(members):
+        print(f"No selected member has a '{options.task}' task")
+        return
+
+    start = time.perf_counter()
+    results = run_task(monorepo_root, graph, options.task, members, jobs, options.type)
+    seconds = time.perf_counter() - start
+
+    counts = {status: sum(result.status == status for result in results.values()) for status in TASK_STATUSES}
+    print(f"\nTask '{options.task}': " + ", ".join(f"{count} {status}" for status, count in counts.items()), end="")
+    print(f" ({seconds:.1f}s, {jobs} workers)")
+    for path, result in sorted(results.items()):
+        if result.status == "passed":
+            print(f"  ✓ {path} ({result.seconds:.1f}s)")
+        elif result.status == "failed":
+            print(f"  ✗ {path} ({result.seconds:.1f}s): {result.reason}")
+        else:
+            print(f"  - {path}: skipped, {result.reason}")
+    if without_task:
+        print(f"  {len(without_task)} member(s) without a '{options.task}' task")
+
+    if counts["failed"] or counts["skipped"]:
+        sys.exit(1)
+
+
+COMMANDS = {
+    "affected": affected_command,
+    "run": run_command_line,
+}
+
+
+def main() -> None:
+    """Main entry point"""
+    monorepo_root = Path(__file__).parent.parent.absolute()
+
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print("Usage: ./scripts/monorepo.py <command> [options]")
+        print("\nCommands:")
+        print("  affected --base REF [--head REF] [--type python|typescript] [--json]")
+        print("  affected [--type python|typescript] [--json] <file ...>")
+        print("  run <task> [member ...] [--base REF [--head REF]] [--type python|typescript] [--jobs N]")
+        sys.exit(1)
+
+    COMMANDS[sys.argv[1]](monorepo_root, sys.argv[2:])
+
+
+if __name__ == "__main__":
+    main()
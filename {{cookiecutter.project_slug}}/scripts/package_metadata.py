@@ -0,0 +1,48 @@
+"""
+Package metadata helpers shared by the monorepo scripts.
+
+Python package names are compared in their normalized form (PEP 503), and a pyproject.toml's
+requirements are reduced to the names of the packages they require, without versions, markers or
+extras. add-project.py uses them to check whether uv.lock already covers a new project, and
+graph.py to find the dependencies between workspace members.
+
+Usage:
+    from package_metadata import normalize_package_name, python_requirements
+
+    pyproject = tomllib.loads(content)
+    name = normalize_package_name(pyproject["project"]["name"])
+    dependencies = python_requirements(pyproject)
+"""
+
+import re
+from typing import Any
+
+# Package name at the start of a requirement (PEP 508), before any extras, version or marker
+REQUIREMENT_NAME_PATTERN = re.compile(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+
+def normalize_package_name(name: str) -> str:
+    """Normalized Python package name (PEP 503)"""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def python_requirements(pyproject: dict[str, Any]) -> set[str]:
+    """
+    Normalized names of the packages a parsed pyproject.toml requires.
+
+    Covers [project] dependencies, optional dependencies and dependency groups.
+    """
+    project = pyproject.get("project") or {}
+    requirements = list(project.get("dependencies", []))
+    for extra in (project.get("optional-dependencies") or {}).values():
+        requirements += extra
+    for group in (pyproject.get("dependency-groups") or {}).values():
+        # Skip {include-group = "..."} entries
+        requirements += [requirement for requirement in group if isinstance(requirement, str)]
+
+    dependencies = set()
+    for requirement in requirements:
+        match = REQUIREMENT_NAME_PATTERN.match(requirement)
+        if match:
+            dependencies.add(normalize_package_name(match.group(1)))
+    return dependencies
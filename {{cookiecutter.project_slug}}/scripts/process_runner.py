@@ -0,0 +1,164 @@
+"""
+Streaming subprocess runner shared by the monorepo scripts.
+
+Unlike subprocess.run(..., capture_output=True), output is read line by line while the command
+runs: each line can be handed to a callback (e.g. to print it with a prefix) and is kept in a
+bounded ring buffer, so a chatty command never grows memory without limit. Commands that exceed
+their timeout are killed together with their child processes. On failure, the tail of the output
+is available to explain what went wrong.
+
+Usage:
+    from process_runner import CommandError, run_command
+
+    result = run_command(["npm", "install"], cwd=root, timeout=600, on_line=print)
+    if not result.ok:
+        print(result.output)
+
+    # Or raise CommandError (a subprocess.CalledProcessError) on failure
+    run_command(["git", "fetch", repo, sha], cwd=checkout, timeout=300, check=True)
+"""
+
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+# Output lines kept for error reports
+DEFAULT_TAIL_LINES = 200
+
+
+@dataclass
+class CommandResult:
+    """Outcome of run_command"""
+
+    command: list[str]
+    # None if the command could not be started or was killed after its timeout
+    returncode: Optional[int]
+    seconds: float
+    # Last lines of the combined stdout/stderr
+    tail: list[str] = field(default_factory=list)
+    timed_out: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+    @property
+    def output(self) -> str:
+        """The output tail as text"""
+        return "\n".join(self.tail)
+
+    def describe_failure(self, timeout: Optional[float] = None) -> str:
+        """One-line reason the command failed"""
+        if self.timed_out:
+            return f"'{' '.join(self.command)}' timed out after {timeout or self.seconds:.0f}s"
+        if self.returncode is None:
+            return f"'{' '.join(self.command)}' could not be started"
+        return f"'{' '.join(self.command)}' exited with status {self.returncode}"
+
+
+class CommandError(subprocess.CalledProcessError):
+    """
+    Raised by run_command(check=True) when a command fails, times out or can't be started.
+
+    A subprocess.CalledProcessError, so existing handlers keep working; output and stderr hold the
+    tail of the combined output.
+    """
+
+    def __init__(self, result: CommandResult, timeout: Optional[float] = None) -> None:
+        returncode = result.returncode if result.returncode is not None else -1
+        super().__init__(returncode, result.command, output=result.output, stderr=result.output)
+        self.result = result
+        self.reason = result.describe_failure(timeout)
+
+    def __str__(self) -> str:
+        return self.reason
+
+
+def run_command(
+    command: list[str],
+    cwd: Optional[Union[str, Path]] = None,
+    timeout: Optional[float] = None,
+    on_line: Optional[Callable[[str], None]] = None,
+    tail_lines: int = DEFAULT_TAIL_LINES,
+    check: bool = False,
+    env: Optional[dict[str, str]] = None,
+) -> CommandResult:
+    """
+    Run a command, streaming its combined stdout/stderr line by line.
+
+    Each line (without the trailing newline) is passed to on_line and kept in a ring buffer of the
+    last tail_lines lines. stdin is not connected. After timeout seconds the command and its child
+    processes are killed. With check=True, CommandError is raised unless the command succeeds.
+    """
+    start = time.perf_counter()
+    tail: deque[str] = deque(maxlen=tail_lines)
+
+    try:
+        process = subprocess.Popen(
+            command,
+            cwd=cwd,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            # Own process group, so a timeout also kills the command's children (npm, git helpers)
+            start_new_session=os.name == "posix",
+        )
+    except OSError as e:
+        result = CommandResult(command, None, time.perf_counter() - start, [str(e)])
+        if check:
+            raise CommandError(result) from e
+        return result
+
+    timed_out = threading.Event()
+
+    def kill() -> None:
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except OSError:
+            # Already exited
+            pass
+
+    def expire() -> None:
+        timed_out.set()
+        kill()
+
+    timer = threading.Timer(timeout, expire) if timeout else None
+    if timer:
+        timer.daemon = True
+        timer.start()
+
+    assert process.stdout is not None
+    try:
+        for line in process.stdout:
+            line = line.rstrip("\r\n")
+            tail.append(line)
+            if on_line:
+                on_line(line)
+        returncode: Optional[int] = process.wait()
+    finally:
+        if timer:
+            timer.cancel()
+        if process.poll() is None:
+            # Interrupted (e.g. Ctrl-C in the callback) - don't leave the command running
+            kill()
+            process.wait()
+        process.stdout.close()
+
+    if timed_out.is_set():
+        returncode = None
+    result = CommandResult(command, returncode, time.perf_counter() - start, list(tail), timed_out.is_set())
+    if check and not result.ok:
+        raise CommandError(result, timeout)
+    return result